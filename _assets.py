@@ -0,0 +1,685 @@
+import pygame
+import os, io, json, struct, threading, weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# ***********************************************                      ***********************************************
+# *********************************************** @START ASSET CACHES ***********************************************
+# ***********************************************                      ***********************************************
+
+# Default memory budget (in bytes) of the process-wide surface cache
+cacheLimit   = 64 * 1024 * 1024
+
+# Default quantisation step (in degrees) of the rotation atlas
+rotationStep = 5
+
+# Default number of rendered text surfaces kept by the text cache
+textLimit    = 128
+
+# Directories holding the game's assets (the `atlas` one holds the sheets packed by the texture atlas)
+assetDirectories = ['sprites', 'sounds', 'fonts', 'atlas']
+
+# Directory of the texture atlas sheets and the widest sheet the atlas packer produces
+atlasDirectory   = 'atlas'
+atlasWidth       = 1024
+
+# Packed asset archive read instead of the separate files when present (see `AssetArchive`)
+archivePath  = 'assets.pak'
+
+
+# Packed asset archive: all the asset files in a single file, so only one file has to be opened at startup.
+# Layout: 8 bytes magic, 4 bytes (little endian) length of the index, JSON index mapping the paths
+# (e.g. "sprites/bomb.png") to their [offset, length] within the contiguous blob which follows the index
+class AssetArchive:
+
+    magic = b'DF2DPACK'
+
+    def __init__(self, path):
+
+        self.file = open(path, 'rb')
+        self.lock = threading.Lock()
+
+        if self.file.read(len(self.magic)) != self.magic:
+            raise ValueError('Not an asset archive: ' + path)
+
+        length, = struct.unpack('<I', self.file.read(4))
+        self.index = json.loads(self.file.read(length).decode('utf-8'))
+        self.base  = self.file.tell()
+
+    def names(self):
+        return list(self.index)
+
+    def read(self, path):
+        offset, length = self.index[path]
+
+        # Shared by the preload threads
+        with self.lock:
+            self.file.seek(self.base + offset)
+            return self.file.read(length)
+
+    # Pack all the files of the asset directories into a new archive
+    @classmethod
+    def pack(cls, path, directories=assetDirectories):
+
+        paths = sorted('{}/{}'.format(directory, name) for directory in directories if os.path.isdir(directory) for name in os.listdir(directory))
+        index = dict()
+        blob  = bytearray()
+
+        for name in paths:
+            with open(name, 'rb') as file:
+                data = file.read()
+
+            index[name] = [len(blob), len(data)]
+            blob       += data
+
+        header = json.dumps(index).encode('utf-8')
+
+        with open(path, 'wb') as file:
+            file.write(cls.magic + struct.pack('<I', len(header)) + header + blob)
+
+        return len(paths)
+
+
+# Single access point to the contents of the asset files. Files are served from the memory when they were preloaded,
+# otherwise from the archive (if used) or from the disk. `open()` returns a file object accepted by all the Pygame loaders
+class AssetSources:
+
+    def __init__(self):
+
+        self.archive = None
+        self.files   = dict()
+
+    def useArchive(self, path=archivePath):
+        if os.path.isfile(path):
+            self.archive = AssetArchive(path)
+
+        return self.archive is not None
+
+    # Paths of all the asset files, e.g. "sprites/bomb.png"
+    def names(self, directories=assetDirectories):
+
+        if self.archive is not None:
+            return [name for name in self.archive.names() if name.split('/')[0] in directories]
+
+        return ['{}/{}'.format(directory, name) for directory in directories if os.path.isdir(directory) for name in sorted(os.listdir(directory))]
+
+    def read(self, path):
+
+        data = self.files.get(path)
+
+        if data is not None:
+            return data
+
+        if self.archive is not None and path in self.archive.index:
+            return self.archive.read(path)
+
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def exists(self, path):
+        return path in self.files or (self.archive is not None and path in self.archive.index) or os.path.isfile(path)
+
+    def open(self, directory, name):
+        return io.BytesIO(self.read('{}/{}'.format(directory, name)))
+
+
+# Single source of the asset files shared by all the caches and loaders
+sources = AssetSources()
+
+
+# Process-wide cache of converted surfaces keyed by their filename. Surfaces are loaded from the `sprites`
+# directory and converted only once, afterwards every sprite receives the very same surface object.
+# When the total size of the cached pixels exceeds the `limit` the least recently used surfaces are evicted.
+# Note: cached surfaces are shared between sprites, hence they must never be drawn onto directly
+class SurfaceCache:
+
+    def __init__(self, limit=cacheLimit):
+
+        self.limit     = limit
+        self.entries   = OrderedDict()
+        self.size      = 0
+
+        # Filename of every surface the cache ever served (as long as the surface is alive), see `surfaceKey()`
+        self.names     = weakref.WeakKeyDictionary()
+
+        # Counters which can be queried through `stats()`
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+        self.reads     = 0
+
+    # Return the converted surface stored under `name`, loading it from the disk on a miss.
+    # Images packed into the texture atlas are served as views of their sheet instead
+    def get(self, name):
+
+        if name in atlas.owners:
+            return atlas.get(name)
+
+        surface = self.entries.get(name)
+
+        if surface is not None:
+            self.entries.move_to_end(name)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = self.load(name)
+        self.put(name, surface)
+
+        return surface
+
+    # The only place where the surfaces are read (from the disk, the archive or the preloaded files) and decoded
+    def load(self, name):
+        self.reads += 1
+        return pygame.image.load(sources.open('sprites', name), name).convert_alpha()
+
+    # Store the surface and evict the least recently used ones when the memory cap is exceeded
+    # (the newly added surface itself is never evicted, even if it alone exceeds the cap)
+    def put(self, name, surface):
+
+        if name in self.entries:
+            self.size -= self.footprint(self.entries.pop(name))
+
+        self.entries[name]   = surface
+        self.names[surface]  = name
+        self.size           += self.footprint(surface)
+        self.evict()
+
+    def evict(self):
+        while self.size > self.limit and len(self.entries) > 1:
+            name, surface = self.entries.popitem(last=False)
+            self.size    -= self.footprint(surface)
+            self.evictions += 1
+
+    # Change the memory cap at runtime and drop surfaces that no longer fit
+    def setLimit(self, limit):
+        self.limit = limit
+        self.evict()
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    # Number of bytes occupied by the pixels of the surface
+    @staticmethod
+    def footprint(surface):
+        return surface.get_pitch() * surface.get_height()
+
+    # Snapshot of the counters, e.g. `reads` should stay constant during the steady-state gameplay
+    def stats(self):
+        return {"entries"   : len(self.entries),
+                "bytes"     : self.size,
+                "limit"     : self.limit,
+                "hits"      : self.hits,
+                "misses"    : self.misses,
+                "evictions" : self.evictions,
+                "reads"     : self.reads}
+
+
+# Single cache instance shared by all game sprites
+surfaces = SurfaceCache()
+
+
+# Atlas of pre-rendered rotations. Each source surface is rotated at angles quantised to the `step` (e.g. 0, 5, 10, ... 355 degrees)
+# either lazily, when a particular angle is requested for the first time, or all at once through `preload()`.
+# Together with every rotated frame the offset of its top left corner from the rotation centre is stored,
+# thus the sprites can place the frame with a lookup instead of calling `pygame.transform.rotate` and `get_rect(center=...)`.
+# Atlases are held weakly so they disappear together with their source surface
+class RotationCache:
+
+    def __init__(self, step=rotationStep):
+
+        self.step     = step
+        self.count    = int(round(360 / step))
+        self.atlases  = weakref.WeakKeyDictionary()
+
+        # Source surface (a weak reference, the frames must not keep their source alive) and the angle index
+        # of every rotated frame, see `surfaceKey()`
+        self.sources  = weakref.WeakKeyDictionary()
+
+        self.hits     = 0
+        self.misses   = 0
+
+    # List of (surface, offset) frames of the source surface; `None` marks the frame which was not rendered yet
+    def atlas(self, surface):
+
+        frames = self.atlases.get(surface)
+
+        if frames is None:
+            frames = self.atlases[surface] = [None] * self.count
+
+        return frames
+
+    # Return (surface, offset) pair for the quantised angle (in degrees, any value including negative and above 360)
+    def frame(self, surface, angle):
+
+        frames = self.atlas(surface)
+        index  = int(round(angle / self.step)) % self.count
+        entry  = frames[index]
+
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        rotated = pygame.transform.rotate(surface, index * self.step)
+        width, height = rotated.get_size()
+        entry   = frames[index] = (rotated, (-(width // 2), -(height // 2)))
+
+        self.sources[rotated] = (weakref.ref(surface), index)
+
+        return entry
+
+    # Return (surface, rect) of the rotated source placed with its centre at the `center` coordinates
+    def place(self, surface, angle, center):
+
+        rotated, offset = self.frame(surface, angle)
+        rect = pygame.Rect((center[0] + offset[0], center[1] + offset[1]), rotated.get_size())
+
+        return rotated, rect
+
+    # Render all the angles upfront so the gameplay never has to rotate anything
+    def preload(self, surface):
+        for index in range(self.count):
+            self.frame(surface, index * self.step)
+
+    def stats(self):
+        return {"atlases" : len(self.atlases),
+                "step"    : self.step,
+                "hits"    : self.hits,
+                "misses"  : self.misses}
+
+
+# Single rotation atlas shared by all game sprites
+rotations = RotationCache()
+
+
+# Bank of frame sequences used by the animations (e.g. `explosion0.png` ... `explosion8.png`). Each sequence is loaded once,
+# packed side by side into a single sprite sheet surface and served as a tuple of subsurface views of that sheet,
+# therefore all the sprites playing the same animation share the very same pixels and only have to index the tuple
+class AnimationBank:
+
+    def __init__(self, cache=surfaces):
+
+        self.cache     = cache
+        self.sequences = dict()
+        self.sheets    = dict()
+
+    # Return the tuple of frames built from the files `pattern.format(0)` ... `pattern.format(count-1)`.
+    # Sequences packed into the texture atlas already are views of a single sheet and are served as they are
+    def get(self, pattern, count):
+
+        key    = (pattern, count)
+        frames = self.sequences.get(key)
+
+        if frames is None:
+            names = [pattern.format(i) for i in range(count)]
+
+            if all(name in atlas.owners for name in names):
+                frames = self.sequences[key] = tuple(self.cache.get(name) for name in names)
+
+            else:
+                frames = self.sequences[key] = self.pack(key, [self.cache.get(name) for name in names])
+
+        return frames
+
+    # Blit all the frames onto one sheet and return subsurfaces pointing at the consecutive frames
+    def pack(self, key, images):
+
+        width  = sum(image.get_width() for image in images)
+        height = max(image.get_height() for image in images)
+
+        sheet  = pygame.Surface((width, height), pygame.SRCALPHA).convert_alpha()
+        sheet.fill((0, 0, 0, 0))
+
+        frames = list()
+        x      = 0
+
+        # Max blending onto the fully transparent sheet copies the pixels as they are, whereas
+        # the default alpha blending would darken the semi-transparent edges of the frames
+        for image in images:
+            sheet.blit(image, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            frames.append(sheet.subsurface(pygame.Rect((x, 0), image.get_size())))
+            x += image.get_width()
+
+        self.sheets[key] = sheet
+
+        return tuple(frames)
+
+    def clear(self):
+        self.sequences.clear()
+        self.sheets.clear()
+
+    def stats(self):
+        return {"sequences" : len(self.sequences),
+                "frames"    : sum(len(frames) for frames in self.sequences.values()),
+                "bytes"     : sum(SurfaceCache.footprint(sheet) for sheet in self.sheets.values())}
+
+
+# Single animation bank shared by all game sprites
+animations = AnimationBank()
+
+
+# Texture atlas: named groups of images (e.g. all the frames of the player) packed onto one sheet each, with an index
+# mapping every image to its rect on the sheet. The images are then served as subsurfaces of the sheet, so a whole group
+# is decoded and converted as a single surface. The sheet and its JSON index are saved to the `atlas` directory the first
+# time a group is packed (or ahead of time by `rebuild()`); later runs load the sheet alone. A saved sheet whose index does
+# not list exactly the images of its group is packed again, after changing the images delete the sheets or rebuild them
+class TextureAtlas:
+
+    def __init__(self, directory=atlasDirectory, width=atlasWidth):
+
+        self.directory = directory
+        self.width     = width
+        self.groups    = dict()
+        self.owners    = dict()
+        self.sheets    = dict()
+        self.frames    = dict()
+        self.names     = weakref.WeakKeyDictionary()
+
+        self.packs     = 0
+
+    # Declare the group of images packed onto the sheet `sheet`
+    def define(self, sheet, names):
+
+        self.groups[sheet] = list(names)
+
+        for name in names:
+            self.owners[name] = sheet
+
+    def get(self, name):
+
+        frame = self.frames.get(name)
+
+        if frame is None:
+            self.build(self.owners[name])
+            frame = self.frames[name]
+
+        return frame
+
+    def path(self, sheet, extension):
+        return '{}/{}.{}'.format(self.directory, sheet, extension)
+
+    # Index of the saved sheet, or None when it is missing or does not match its group
+    def index(self, sheet):
+
+        if not sources.exists(self.path(sheet, 'json')):
+            return None
+
+        index = json.loads(sources.read(self.path(sheet, 'json')).decode('utf-8'))
+
+        if set(index) != set(self.groups[sheet]) or not sources.exists(self.path(sheet, 'png')):
+            return None
+
+        return index
+
+    # Load the saved sheet, or pack the group's images and save the new sheet
+    def build(self, sheet):
+
+        index = self.index(sheet)
+
+        if index is not None:
+            self.install(sheet, pygame.image.load(sources.open(self.directory, sheet + '.png'), sheet + '.png').convert_alpha(), index)
+
+        else:
+            self.save(sheet, *self.pack(sheet))
+
+    # Register the sheet and the views of its images
+    def install(self, sheet, surface, index):
+
+        self.sheets[sheet] = surface
+
+        for name, rect in index.items():
+            frame = self.frames[name] = surface.subsurface(pygame.Rect(rect))
+            self.names[frame] = name
+
+    # Shelf packing: the images sorted by height are placed left to right in rows no wider than `width`
+    def pack(self, sheet):
+
+        images = {name : surfaces.load(name) for name in self.groups[sheet]}
+        order  = sorted(images, key=lambda name: images[name].get_height(), reverse=True)
+        index  = dict()
+        x, y   = 0, 0
+        row    = 0
+        width  = 0
+
+        for name in order:
+            w, h = images[name].get_size()
+
+            if x > 0 and x + w > self.width:
+                x, y = 0, y + row
+                row  = 0
+
+            index[name] = [x, y, w, h]
+            x          += w
+            row         = max(row, h)
+            width       = max(width, x)
+
+        surface = pygame.Surface((width, y + row), pygame.SRCALPHA).convert_alpha()
+        surface.fill((0, 0, 0, 0))
+
+        # Max blending copies the pixels as they are (see `AnimationBank.pack`)
+        for name, rect in index.items():
+            surface.blit(images[name], rect[:2], special_flags=pygame.BLEND_RGBA_MAX)
+
+        self.packs += 1
+        self.install(sheet, surface, index)
+
+        return surface, index
+
+    # Save the sheet for the next runs, the game still runs from a read-only directory
+    def save(self, sheet, surface, index):
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            pygame.image.save(surface, self.path(sheet, 'png'))
+
+            with open(self.path(sheet, 'json'), 'w') as file:
+                json.dump(index, file)
+
+        except (OSError, pygame.error) as message:
+            print('Cannot save atlas sheet: {} ({})'.format(sheet, message))
+
+    # Pack and save all the groups again (offline, e.g. before packing the asset archive)
+    def rebuild(self):
+        for sheet in self.groups:
+            self.save(sheet, *self.pack(sheet))
+
+    def stats(self):
+        return {"sheets" : len(self.sheets),
+                "frames" : len(self.frames),
+                "packs"  : self.packs,
+                "bytes"  : sum(SurfaceCache.footprint(sheet) for sheet in self.sheets.values())}
+
+
+# Single texture atlas shared by the surface cache and the animation bank
+atlas = TextureAtlas()
+
+
+# Name of the surface which refers to the same image in any process (e.g. the server and the clients of a networked game):
+# the filename of the image, followed by `@` and the angle index for the frames of the rotation atlas.
+# Surfaces which came from neither the caches nor the atlas have no key (None)
+def surfaceKey(surface):
+
+    source = rotations.sources.get(surface)
+
+    if source is not None:
+        original = source[0]()
+        return None if original is None else '{}@{}'.format(surfaceKey(original), source[1])
+
+    return surfaces.names.get(surface) or atlas.names.get(surface)
+
+
+# Surface of this process for the key returned by `surfaceKey()`
+def surfaceFromKey(key):
+
+    name, separator, index = key.rpartition('@')
+
+    if separator:
+        return rotations.frame(surfaceFromKey(name), int(index) * rotations.step)[0]
+
+    return surfaces.get(key)
+
+
+# Pool of fonts keyed by (face, size), where the face is the name of the TTF file in the `fonts` directory
+# (or None for the default Pygame font). Constructing `pygame.font.Font` parses the whole file, hence each font is created only once
+class FontPool:
+
+    def __init__(self):
+        self.fonts = dict()
+
+    def get(self, face, size):
+
+        key  = (face, size)
+        font = self.fonts.get(key)
+
+        if font is None:
+            path = None if face is None else sources.open('fonts', '{}.ttf'.format(face))
+            font = self.fonts[key] = pygame.font.Font(path, size)
+
+        return font
+
+    def clear(self):
+        self.fonts.clear()
+
+
+# Cache of rendered text surfaces keyed by (face, size, text, colour). Text which does not change between
+# the frames (e.g. banners, unchanged score) is rasterised only once; the least recently used surfaces are
+# evicted when more than `limit` of them are stored
+class TextCache:
+
+    def __init__(self, pool, limit=textLimit):
+
+        self.pool    = pool
+        self.limit   = limit
+        self.entries = OrderedDict()
+
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+
+    def render(self, face, size, text, colour):
+
+        key     = (face, size, text, tuple(colour))
+        surface = self.entries.get(key)
+
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = self.entries[key] = self.pool.get(face, size).render(text, True, colour)
+
+        while len(self.entries) > self.limit:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {"entries"   : len(self.entries),
+                "limit"     : self.limit,
+                "fonts"     : len(self.pool.fonts),
+                "hits"      : self.hits,
+                "misses"    : self.misses,
+                "evictions" : self.evictions}
+
+
+# Single font pool and text cache shared by the HUD, banners and menus
+fonts = FontPool()
+texts = TextCache(fonts)
+
+
+# Cache of collision masks keyed weakly by their surface, so every image (including each frame of the rotation atlas
+# and the animation bank) is scanned by `pygame.mask.from_surface` only once and the mask disappears together with the surface
+class MaskCache:
+
+    def __init__(self):
+
+        self.masks  = weakref.WeakKeyDictionary()
+
+        self.hits   = 0
+        self.misses = 0
+
+    def get(self, surface):
+
+        mask = self.masks.get(surface)
+
+        if mask is not None:
+            self.hits += 1
+            return mask
+
+        self.misses += 1
+        mask = self.masks[surface] = pygame.mask.from_surface(surface)
+
+        return mask
+
+    def stats(self):
+        return {"masks"  : len(self.masks),
+                "hits"   : self.hits,
+                "misses" : self.misses}
+
+
+# Single mask cache shared by all collision tests
+masks = MaskCache()
+
+
+
+# Startup preload stage: all the asset files are read and the images decoded on a pool of threads, then the surfaces
+# are converted on the main thread (conversion needs the display) and put into the surface cache. The sound clips are decoded
+# into the sound bank on the main thread as well, so no clip is decoded in the middle of the game; the music and the fonts
+# stay in the memory as the preloaded files. `progress(done, total)` is called on the main thread after each file
+def preload(progress=None, workers=None):
+
+    # The sound bank reads its clips through the asset sources, hence it is only imported here
+    from _audio import sounds, streamedSounds
+
+    images   = ['.png', '.jpg', '.jpeg', '.gif', '.bmp']
+    done     = 0
+
+    # Images packed onto a saved atlas sheet are decoded as a part of the sheet only
+    indexes  = {sheet : atlas.index(sheet) for sheet in atlas.groups}
+    names    = [path for path in sources.names() if indexes.get(atlas.owners.get(path.split('/', 1)[1])) is None]
+
+    def read(path):
+
+        data = sources.read(path)
+
+        if os.path.splitext(path)[1].lower() in images:
+            return data, pygame.image.load(io.BytesIO(data), path)
+
+        return data, None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(read, path) : path for path in names}
+
+        for future in as_completed(futures):
+            path          = futures[future]
+            data, surface = future.result()
+
+            directory, name = path.split('/', 1)
+            sheet           = os.path.splitext(name)[0]
+
+            if surface is None:
+                sources.files[path] = data
+
+                if directory == 'sounds' and name not in streamedSounds:
+                    sounds.get(name)
+
+            elif directory == atlas.directory:
+                if indexes.get(sheet) is not None:
+                    atlas.install(sheet, surface.convert_alpha(), indexes[sheet])
+
+            else:
+                surfaces.put(name, surface.convert_alpha())
+
+            done += 1
+
+            if progress is not None:
+                progress(done, len(names))
+
+    return len(names)
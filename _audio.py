@@ -0,0 +1,127 @@
+import pygame
+
+from _assets import sources
+
+# ***********************************************               ***********************************************
+# *********************************************** @START AUDIO ***********************************************
+# ***********************************************               ***********************************************
+
+# Number of mixer channels shared by all the sound effects (the music is streamed separately)
+mixerChannels   = 16
+
+# Priorities of the clips: when all the channels are busy a new clip takes over the channel of the lowest priority
+# (the oldest one among equals), as long as that priority is not higher than its own, otherwise the new clip is dropped
+soundPriorities = {"shot.wav"      : 1,
+                   "explosion.wav" : 2,
+                   "aliens.wav"    : 3}
+
+# Files of the `sounds` directory which are music streamed by the mixer, never decoded into clips (see `preload()` of the assets)
+streamedSounds  = ["main.wav"]
+
+
+# Stand-in for the clips when there is no mixer (e.g. Pygame built without sound)
+class NoneSound:
+    def play(self, *args): pass
+
+
+# Bank of the decoded clips keyed by their filename in the `sounds` directory. Decoding a WAV file is far too slow
+# for the update path, therefore each clip is decoded only once and every sprite receives the very same `Sound` object
+class SoundBank:
+
+    def __init__(self):
+
+        self.clips = dict()
+        self.reads = 0
+
+    def get(self, name):
+
+        clip = self.clips.get(name)
+
+        if clip is None:
+            clip = self.clips[name] = self.load(name)
+
+        return clip
+
+    def load(self, name):
+
+        if not pygame.mixer or not pygame.mixer.get_init():
+            return NoneSound()
+
+        self.reads += 1
+        return pygame.mixer.Sound(file=sources.open('sounds', name))
+
+    def priority(self, name):
+        return soundPriorities.get(name, 0)
+
+    def stats(self):
+        return {"clips" : len(self.clips),
+                "reads" : self.reads}
+
+
+# Fixed pool of mixer channels. Clips are played on a free channel, or steal the voice of the least important
+# (then the oldest) clip being played, so bursts of explosions and gunfire neither block nor exhaust the mixer
+class ChannelPool:
+
+    def __init__(self, count=mixerChannels):
+
+        self.count    = count
+        self.channels = None
+        self.voices   = list()
+        self.sequence = 0
+
+        # Nothing is played while muted (e.g. while the networked client simulates the steps again, see `connect()` of the game)
+        self.muted    = False
+
+        # Counters which can be queried through `stats()`
+        self.plays    = 0
+        self.steals   = 0
+        self.drops    = 0
+
+    # Allocate the channels once the mixer is initialised, all of them are reserved so nothing else grabs them
+    def open(self):
+
+        pygame.mixer.set_num_channels(self.count)
+        pygame.mixer.set_reserved(self.count)
+
+        self.channels = [pygame.mixer.Channel(i) for i in range(self.count)]
+        self.voices   = [(0, 0)] * self.count
+
+    # Play the clip (`loops` as in `Channel.play`, -1 - indefinitely) and return its channel, or None if it was dropped
+    def play(self, clip, priority=0, loops=0):
+
+        if self.muted or isinstance(clip, NoneSound):
+            return None
+
+        if self.channels is None:
+            self.open()
+
+        index = next((i for i, channel in enumerate(self.channels) if not channel.get_busy()), None)
+
+        if index is None:
+            index = min(range(self.count), key=lambda i: self.voices[i])
+
+            if self.voices[index][0] > priority:
+                self.drops += 1
+                return None
+
+            self.steals += 1
+
+        self.sequence      += 1
+        self.voices[index]  = (priority, self.sequence)
+        self.plays         += 1
+
+        self.channels[index].play(clip, loops)
+
+        return self.channels[index]
+
+    def stats(self):
+        return {"channels" : self.count,
+                "busy"     : sum(channel.get_busy() for channel in self.channels) if self.channels else 0,
+                "plays"    : self.plays,
+                "steals"   : self.steals,
+                "drops"    : self.drops}
+
+
+# Single sound bank and channel pool shared by all game sprites
+sounds   = SoundBank()
+channels = ChannelPool()
@@ -0,0 +1,141 @@
+import pygame
+
+from _assets import masks
+
+# ***********************************************                   ***********************************************
+# *********************************************** @START COLLISIONS ***********************************************
+# ***********************************************                   ***********************************************
+
+# Default size (in pixels) of the square cells of the spatial hash
+cellSize = 64
+
+
+# Sprite group which additionally indexes its sprites in a spatial hash: a dictionary of grid cells mapped to the sets
+# of sprites whose rectangles overlap the cell. Collision queries only test the sprites sharing a cell with the queried
+# rectangle instead of every sprite of the group. Sprites move by changing their rects in place, therefore `refresh()`
+# has to be called once the sprites moved (i.e. each simulation step); only the sprites which crossed a cell boundary are re-hashed.
+# Results of the queries are exactly the same as those of `pygame.sprite.spritecollide` and `groupcollide`, including their order
+class SpatialGroup(pygame.sprite.Group):
+
+    def __init__(self, *sprites, cell=cellSize):
+
+        self.cell     = cell
+        self.cells    = dict()
+        self.spans    = dict()
+        self.order    = dict()
+        self.sequence = 0
+
+        pygame.sprite.Group.__init__(self, *sprites)
+
+    # Sprites are indexed lazily by `refresh()` as they might not have their rect yet when they join the group
+    def add_internal(self, sprite, layer=None):
+        pygame.sprite.Group.add_internal(self, sprite)
+
+        # Group keeps the order in which the sprites were added, the same order is used to sort the query results
+        self.sequence      += 1
+        self.order[sprite]  = self.sequence
+        self.spans[sprite]  = None
+
+    def remove_internal(self, sprite):
+        pygame.sprite.Group.remove_internal(self, sprite)
+
+        self.unhash(sprite)
+        del self.order[sprite]
+        del self.spans[sprite]
+
+    # Range of the cells (left, top, right, bottom) covered by the rectangle
+    def span(self, rect):
+        return (rect.left // self.cell, rect.top // self.cell, (rect.right - 1) // self.cell, (rect.bottom - 1) // self.cell)
+
+    def unhash(self, sprite):
+
+        span = self.spans.get(sprite)
+
+        if span is None:
+            return
+
+        for x in range(span[0], span[2] + 1):
+            for y in range(span[1], span[3] + 1):
+                bucket = self.cells[(x, y)]
+                bucket.discard(sprite)
+
+                if not bucket:
+                    del self.cells[(x, y)]
+
+        self.spans[sprite] = None
+
+    # Re-hash the sprites whose rectangles moved to different cells since the last refresh
+    def refresh(self):
+
+        for sprite in self.sprites():
+            span = self.span(sprite.rect)
+
+            if span == self.spans[sprite]:
+                continue
+
+            self.unhash(sprite)
+
+            for x in range(span[0], span[2] + 1):
+                for y in range(span[1], span[3] + 1):
+                    self.cells.setdefault((x, y), set()).add(sprite)
+
+            self.spans[sprite] = span
+
+    # Sprites of the group colliding with the rectangle, sorted in the group's order
+    def query(self, rect):
+
+        left, top, right, bottom = self.span(rect)
+        candidates = set()
+
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                bucket = self.cells.get((x, y))
+
+                if bucket:
+                    candidates |= bucket
+
+        return sorted((sprite for sprite in candidates if rect.colliderect(sprite.rect)), key=self.order.__getitem__)
+
+    # Equivalent of `pygame.sprite.spritecollide(sprite, self, dokill, collided)`, the rects of the returned
+    # sprites always overlap, so `collided` (e.g. `collide_mask`) only refines the broad-phase candidates
+    def collide(self, sprite, dokill=False, collided=None):
+
+        crashed = self.query(sprite.rect)
+
+        if collided is not None:
+            crashed = [other for other in crashed if collided(sprite, other)]
+
+        if dokill:
+            for other in crashed:
+                other.kill()
+
+        return crashed
+
+
+# Equivalent of `pygame.sprite.groupcollide(groupa, groupb, dokilla, dokillb, collided)` where `groupb` is a `SpatialGroup`
+def groupcollide(groupa, groupb, dokilla, dokillb, collided=None):
+
+    crashed = dict()
+
+    for sprite in groupa.sprites():
+        collision = groupb.collide(sprite, dokillb, collided)
+
+        if collision:
+            crashed[sprite] = collision
+
+            if dokilla:
+                sprite.kill()
+
+    return crashed
+
+
+# Pixel accurate collision of two sprites: cheap rect overlap test first, then the overlap of their cached masks
+# (unlike `pygame.sprite.collide_mask` the masks are never built from the surfaces during the test)
+def collide_mask(left, right):
+
+    if not left.rect.colliderect(right.rect):
+        return False
+
+    offset = (right.rect.x - left.rect.x, right.rect.y - left.rect.y)
+
+    return masks.get(left.image).overlap(masks.get(right.image), offset) is not None
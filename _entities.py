@@ -0,0 +1,145 @@
+# NumPy is optional, without it the scrolling objects simply update themselves one by one
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# ***********************************************                       ***********************************************
+# *********************************************** @START ENTITY STORE  ***********************************************
+# ***********************************************                       ***********************************************
+
+# Initial number of slots of the entity store, the arrays double whenever they run out of slots
+storeCapacity = 256
+
+
+# Structure of arrays holding the state of the scrolling objects (clouds, bombs, cacti):
+# position, size, speed, layer, whether the object scrolls all the time (`always`), the edge its right border has to cross
+# to be reproduced (`edge`) and whether it may still reproduce itself. Each sprite owns one slot (its index in the arrays).
+# `scroll()` moves all the objects and evaluates their disappear criteria at once, the sprites' rects are synchronised with
+# the arrays afterwards; only the few objects which disappeared (and the busy ones) still update themselves in Python.
+# Whenever a sprite moves by itself (e.g. respawn, rotation, explosion), it must write its rect back through `place()`
+class EntityStore:
+
+    def __init__(self, capacity=storeCapacity):
+
+        self.capacity = capacity
+        self.count    = 0
+        self.sprites  = list()
+        self.free     = list()
+
+        self.x         = numpy.zeros(capacity)
+        self.y         = numpy.zeros(capacity)
+        self.width     = numpy.zeros(capacity)
+        self.height    = numpy.zeros(capacity)
+        self.speed     = numpy.zeros(capacity)
+        self.edge      = numpy.zeros(capacity)
+        self.layer     = numpy.zeros(capacity, dtype=int)
+        self.always    = numpy.zeros(capacity, dtype=bool)
+        self.reproduce = numpy.zeros(capacity, dtype=bool)
+        self.alive     = numpy.zeros(capacity, dtype=bool)
+
+        # Sprites which disappeared in the last pass (see `scroll()`)
+        self.leaving   = set()
+
+    # Double the size of all the arrays
+    def grow(self):
+
+        for column in ["x", "y", "width", "height", "speed", "edge", "layer", "always", "reproduce", "alive"]:
+            array = getattr(self, column)
+            setattr(self, column, numpy.concatenate([array, numpy.zeros_like(array)]))
+
+        self.capacity *= 2
+
+    # Assign a slot to the sprite and copy its state into the arrays
+    def add(self, sprite):
+
+        if self.free:
+            slot = self.free.pop()
+            self.sprites[slot] = sprite
+
+        else:
+            if self.count == self.capacity:
+                self.grow()
+
+            slot = self.count
+            self.count += 1
+            self.sprites.append(sprite)
+
+        sprite.slot       = slot
+        self.alive[slot]  = True
+        self.always[slot] = sprite.always
+        self.edge[slot]   = sprite.edge
+        self.layer[slot]  = sprite._layer
+        self.place(sprite)
+
+        return slot
+
+    def remove(self, sprite):
+
+        slot = sprite.slot
+
+        self.alive[slot]   = False
+        self.sprites[slot] = None
+        self.free.append(slot)
+        sprite.slot = None
+
+    # Copy the sprite's rect, speed and reproduction flag into the arrays
+    def place(self, sprite):
+
+        slot = sprite.slot
+
+        self.x[slot], self.y[slot]           = sprite.rect.topleft
+        self.width[slot], self.height[slot]  = sprite.rect.size
+        self.speed[slot]                     = sprite.scrollingSpeed
+        self.reproduce[slot]                 = sprite.reproduceItself
+
+    # Copy the state of all the given stored sprites into the arrays at once (e.g. after a game state snapshot was loaded)
+    def load(self, sprites):
+
+        slots = [sprite.slot for sprite in sprites]
+        rects = [sprite.rect for sprite in sprites]
+
+        self.x[slots]         = [rect.x for rect in rects]
+        self.y[slots]         = [rect.y for rect in rects]
+        self.width[slots]     = [rect.width for rect in rects]
+        self.height[slots]    = [rect.height for rect in rects]
+        self.speed[slots]     = [sprite.scrollingSpeed for sprite in sprites]
+        self.reproduce[slots] = [sprite.reproduceItself for sprite in sprites]
+
+    # One scrolling pass over the stored objects: those which move all the time and, with `parallax` on, all the others.
+    # Exactly as `Moveable.scroll`, disappear criteria are evaluated on the positions before the move, then the objects move
+    # (rounded to whole pixels like `Rect`, halves away from zero) and their rects are updated. The objects which disappeared are only flagged
+    # (see `disappeared()`), they reproduce themselves once the game updates them in the order of their group
+    def scroll(self, parallax=False):
+
+        n         = self.count
+        moving    = self.alive[:n] & (self.always[:n] | parallax)
+        disappear = moving & self.reproduce[:n] & (self.x[:n] + self.width[:n] <= self.edge[:n])
+
+        x             = self.x[:n]
+        moved         = x[moving] - self.speed[:n][moving]
+        x[moving]     = numpy.copysign(numpy.floor(numpy.abs(moved) + 0.5), moved)
+
+        self.reproduce[:n] &= ~disappear
+        self.leaving        = {self.sprites[slot] for slot in numpy.flatnonzero(disappear)}
+
+        for slot in numpy.flatnonzero(moving):
+            self.sprites[slot].rect.x = int(x[slot])
+
+    # Whether the stored sprite disappeared in the last pass and has to reproduce itself
+    def disappeared(self, sprite):
+        return sprite in self.leaving
+
+    def stats(self):
+        return {"entities" : int(self.alive[:self.count].sum()),
+                "capacity" : self.capacity}
+
+
+# Return a new entity store, or None when NumPy is not installed
+def createStore():
+
+    if numpy is None:
+        print('Cannot create entity store: NumPy is not installed')
+        return None
+
+    return EntityStore()
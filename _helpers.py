@@ -1,6 +1,9 @@
 import pygame
 import os, sys
 
+from _assets import surfaces, rotations, animations, fonts, texts, sources
+from _audio  import sounds, channels
+
 # ***********************************************                        ***********************************************
 # *********************************************** @START GENERIC CLASSES ***********************************************
 # ***********************************************                        ***********************************************
@@ -10,22 +13,22 @@ graphics    = [".jpg", ".jpeg", ".png", ".gif", ".bmp"]
 sound       = [".wav", ".mp3"]
 
 # Generic parent class for all game sprites containing commonly used functionalities
-class GameSprite(pygame.sprite.Sprite):
+# Note: `DirtySprite` behaves as a plain `Sprite` in regular groups, but it also allows the sprites to be drawn by the dirty rectangle renderer
+class GameSprite(pygame.sprite.DirtySprite):
 
     # Resource loader method available to all children classes 
     # (modified version of an exmaple provided by the official documentation)
+    # Images are served from the shared surface cache and sounds from the shared sound bank, so the disk is only touched on the first request
     def resourceLoader(self, name, output=False):
 
         if os.path.splitext(name)[1] in graphics:
 
-            filepath = os.path.join('sprites', name)
-
             try:
 
                 if output:
-                    return pygame.image.load(filepath).convert_alpha()
+                    return surfaces.get(name)
                 
-                self.image = pygame.image.load(filepath).convert_alpha()
+                self.image = surfaces.get(name)
                 self.rect = self.image.get_rect()
 
             except pygame.error as message:
@@ -34,26 +37,102 @@ class GameSprite(pygame.sprite.Sprite):
 
         elif os.path.splitext(name)[1] in sound:
 
-            filepath = os.path.join('sounds', name)
-
-            class NoneSound:
-                def play(self): pass
-
-            if not pygame.mixer:
-                return NoneSound()
-
             try:
-                self.sound = pygame.mixer.Sound(filepath)
+                self.sound         = sounds.get(name)
+                self.soundPriority = sounds.priority(name)
 
             except pygame.error as message:
                 print ('Cannot load sound: ' + name)
                 raise SystemExit(message)
 
-    # Sound player: if loop is specified plays the `self.sound` repeatedly otherwise just once
+    # Sound player: if loop is specified plays the `self.sound` repeatedly otherwise just once, on a channel of the shared pool
     def playSound(self, loop=None):
 
         if loop is None:
-            pygame.mixer.Sound.play(self.sound)
+            channels.play(self.sound, self.soundPriority)
 
         else:
-            pygame.mixer.Sound.play(self.sound, -1)
\ No newline at end of file
+            channels.play(self.sound, self.soundPriority, -1)
+
+# Per-class pools of sprites which were killed and can be brought back to life instead of constructing new ones
+# (constructors load images and sounds, whereas a revived sprite only resets its state and rejoins its groups)
+class SpritePool:
+
+    def __init__(self):
+
+        self.free   = dict()
+
+        # Every sprite ever constructed through the pool under its unique id (see `find()`)
+        self.sprites = dict()
+
+        # Counters which can be queried through `stats()`: `hits` - sprites reused from the pool,
+        # `growth` - sprites that had to be constructed because the pool of their class was empty
+        self.hits   = 0
+        self.growth = 0
+
+    # Return a sprite of the class `cls` initialised with the given constructor arguments
+    def acquire(self, cls, *args, **kwargs):
+
+        free = self.free.get(cls)
+
+        if free:
+            sprite        = free.pop()
+            sprite.pooled = False
+            sprite.revive(*args, **kwargs)
+            self.hits    += 1
+            return sprite
+
+        self.growth += 1
+
+        sprite     = cls(*args, **kwargs)
+        sprite.uid = len(self.sprites) + 1
+        self.sprites[sprite.uid] = sprite
+
+        return sprite
+
+    # Return the sprite with the given id, taken out of the pool if it was there (the caller brings it back to life).
+    # Pooled sprites live as long as the pool, hence their ids identify them in the game state snapshots
+    def find(self, uid):
+
+        sprite = self.sprites[uid]
+
+        if sprite.pooled:
+            self.free[sprite.__class__].remove(sprite)
+            sprite.pooled = False
+
+        return sprite
+
+    # Put the killed sprite to the pool of its class (only once, even if it was killed repeatedly)
+    def release(self, sprite):
+
+        if sprite.pooled:
+            return
+
+        sprite.pooled = True
+        self.free.setdefault(sprite.__class__, list()).append(sprite)
+
+    # Pooled sprites remember their groups, so the pools must be emptied whenever the groups are recreated
+    def clear(self):
+        self.free.clear()
+        self.sprites.clear()
+
+    def stats(self):
+        return {"free"   : sum(len(free) for free in self.free.values()),
+                "hits"   : self.hits,
+                "growth" : self.growth}
+
+
+# Single pool shared by all recyclable sprites
+pools = SpritePool()
+
+
+# Parent class of the sprites which return to the pool when killed. Children classes implement `revive()`
+# which takes the same arguments as their constructor and restores the sprite to its freshly constructed state
+class PooledSprite(GameSprite):
+
+    pooled = False
+    uid    = 0
+
+    def kill(self):
+        super().kill()
+        pools.release(self)
@@ -0,0 +1,133 @@
+import pygame
+import time
+from collections import deque
+
+# ***********************************************               ***********************************************
+# *********************************************** @START INPUT ***********************************************
+# ***********************************************               ***********************************************
+
+# Keys the game reacts to and the names the actions and the player's animations refer to them by
+bindings = {pygame.K_UP    : "up",
+            pygame.K_DOWN  : "down",
+            pygame.K_LEFT  : "left",
+            pygame.K_RIGHT : "right",
+            pygame.K_SPACE : "space",
+            pygame.K_r     : "r",
+            pygame.K_q     : "q"}
+
+# Number of the most recent input latencies kept by the input layer
+latencySamples = 300
+
+
+# Input of one simulation step:
+    # `held`     - keys held down at the end of the step, in the order they were pressed (the most recent one last)
+    # `pressed`  - keys pressed during the step, even those which were released again before the step ran
+    # `released` - keys released during the step
+    # `stamp`    - time (`time.perf_counter()`) of the oldest event behind this input, None when nothing happened
+class TickInput:
+
+    def __init__(self, held=(), pressed=(), released=(), stamp=None):
+
+        self.held     = tuple(held)
+        self.pressed  = tuple(pressed)
+        self.released = tuple(released)
+        self.stamp    = stamp
+
+    # Keys the step acts upon: the held ones followed by those tapped (pressed and released) within the step
+    def keys(self):
+        return self.held + tuple(name for name in self.pressed if name not in self.held)
+
+    # Everything but the timestamp, i.e. what the simulation depends on
+    def state(self):
+        return (self.held, self.pressed, self.released)
+
+
+# Polled input layer: the main loop hands over every received event with `collect()` and each simulation step takes
+# its input with `poll()`, so no key press is lost between two steps no matter how many events arrive per frame.
+# The held keys are tracked from the events and reconciled with `pygame.key.get_pressed()` (e.g. a key released
+# while the window was out of focus), therefore they never depend on the keyboard repeat. Each input is stamped
+# with the time of its oldest event and `presented()` (called once the frame is on the screen) measures the input latency
+class InputLayer:
+
+    def __init__(self, polling=True):
+
+        self.polling   = polling
+        self.held      = list()
+        self.pressed   = list()
+        self.released  = list()
+        self.stamp     = None
+        self.pending   = None
+        self.latencies = deque(maxlen=latencySamples)
+
+    # Take the event into account, return False if it is not an input of the game
+    def collect(self, event, stamp=None):
+
+        if event.type not in [pygame.KEYDOWN, pygame.KEYUP] or event.key not in bindings:
+            return False
+
+        name = bindings[event.key]
+
+        if self.stamp is None:
+            self.stamp = time.perf_counter() if stamp is None else stamp
+
+        if event.type == pygame.KEYDOWN:
+            if name not in self.held:
+                self.held.append(name)
+
+            self.pressed.append(name)
+
+        else:
+            if name in self.held:
+                self.held.remove(name)
+
+            self.released.append(name)
+
+        return True
+
+    # Bring the held keys in line with the keyboard state
+    def reconcile(self):
+
+        state = pygame.key.get_pressed()
+
+        for key, name in bindings.items():
+            if state[key] and name not in self.held:
+                self.held.append(name)
+
+            elif not state[key] and name in self.held:
+                self.held.remove(name)
+
+    # Input of the next simulation step (the events collected since the previous step and the held keys)
+    def poll(self):
+
+        if self.polling:
+            self.reconcile()
+
+        inputs = TickInput(self.held, self.pressed, self.released, self.stamp)
+
+        if self.stamp is not None and self.pending is None:
+            self.pending = self.stamp
+
+        self.pressed  = list()
+        self.released = list()
+        self.stamp    = None
+
+        return inputs
+
+    # The frame showing the result of the polled input is on the screen: store the latency (in ms) of its oldest event
+    def presented(self):
+
+        if self.pending is not None:
+            self.latencies.append((time.perf_counter() - self.pending) * 1000)
+            self.pending = None
+
+    def stats(self):
+
+        if not self.latencies:
+            return {"samples" : 0}
+
+        ordered = sorted(self.latencies)
+
+        return {"samples" : len(ordered),
+                "mean"    : sum(ordered) / len(ordered),
+                "p95"     : ordered[int(round(0.95 * (len(ordered) - 1)))],
+                "max"     : ordered[-1]}
@@ -0,0 +1,325 @@
+import socket, struct, time, zlib
+from collections import OrderedDict, deque
+
+from _input import TickInput
+
+# ***********************************************                 ***********************************************
+# *********************************************** @START NETWORK ***********************************************
+# ***********************************************                 ***********************************************
+
+# Default UDP port of the server and the rate (per second) the server sends its state to the clients
+serverPort     = 47800
+sendRate       = 20
+
+# Number of the most recent states the server keeps as delta baselines, and the client for decoding
+baselineStates = 64
+
+# Keys carried by the input messages, one bit each
+networkKeys    = ["up", "down", "left", "right", "space", "r", "q"]
+
+# Largest datagram read from the socket
+datagramSize   = 65507
+
+# Inputs of a client waiting for the steps of the server, beyond them the oldest ones are merged into one step (see `inputs()`)
+inputBacklog   = 4
+
+# Period (in seconds) over which the traffic rates are measured
+trafficWindow  = 1.0
+
+# Message types and their layouts (little endian), each message starts with its type:
+    # JOIN    - client asks for a seat
+    # WELCOME - seat given to the client and the simulation rate of the server
+    # INPUT   - input of the client's step `tick` (bit masks of `networkKeys`) and the newest state the client received (`ack`)
+    # STATE   - state of the server after the step `tick` encoded against the state `base` (0 - not a delta), the last input
+    #           of the client applied by the server and the held keys of every seat, followed by the compressed payload
+JOIN, WELCOME, INPUT, STATE = range(4)
+
+joinLayout    = struct.Struct('<B')
+welcomeLayout = struct.Struct('<BBH')
+inputLayout   = struct.Struct('<BIIBBB')
+stateLayout   = struct.Struct('<BIIIB')
+
+# Shortest valid message of each type, anything shorter (e.g. an empty stray datagram) is dropped
+messageSizes  = {JOIN : joinLayout.size, WELCOME : welcomeLayout.size, INPUT : inputLayout.size, STATE : stateLayout.size}
+
+
+# Whether the datagram is long enough for the message type it starts with
+def complete(data):
+    return len(data) > 0 and len(data) >= messageSizes.get(data[0], 1)
+
+
+# Bit mask of the key names and back
+def packKeys(names):
+    return sum(1 << networkKeys.index(name) for name in names if name in networkKeys)
+
+def unpackKeys(mask):
+    return tuple(name for i, name in enumerate(networkKeys) if mask & (1 << i))
+
+
+# Delta compression of the state snapshots: the new state is XORed with the baseline the receiver already has (both padded
+# with zeros to the longer one), which turns every unchanged byte into a zero, and the result is compressed. The length
+# of the new state leads the payload. Without a baseline the state itself is compressed
+def encodeDelta(current, base=None):
+
+    length = len(current)
+
+    if base is not None:
+        padded  = max(length, len(base))
+        current = (int.from_bytes(current.ljust(padded, b'\0'), 'little') ^ int.from_bytes(base.ljust(padded, b'\0'), 'little')).to_bytes(padded, 'little')
+
+    return struct.pack('<I', length) + zlib.compress(current, 1)
+
+
+def decodeDelta(payload, base=None):
+
+    length, = struct.unpack_from('<I', payload)
+    current = zlib.decompress(payload[4:])
+
+    if base is not None:
+        current = (int.from_bytes(current, 'little') ^ int.from_bytes(base.ljust(len(current), b'\0'), 'little')).to_bytes(len(current), 'little')
+
+    return current[:length]
+
+
+# Traffic of one connection: the bytes sent and received in total, and in the last `trafficWindow` seconds (see `rates()`)
+class Traffic:
+
+    def __init__(self, window=trafficWindow):
+
+        self.window   = window
+        self.sent     = 0
+        self.received = 0
+        self.recent   = deque()
+        self.start    = time.perf_counter()
+
+    # Count a message sent or received now
+    def count(self, sent=0, received=0):
+
+        self.sent     += sent
+        self.received += received
+        self.recent.append((time.perf_counter(), sent, received))
+
+        self.expire()
+
+    # Forget the messages older than the window
+    def expire(self):
+
+        cutoff = time.perf_counter() - self.window
+
+        while self.recent and self.recent[0][0] < cutoff:
+            self.recent.popleft()
+
+    # Bytes per second over the last window (or over the whole connection while it is younger than the window) and the totals
+    def rates(self):
+
+        self.expire()
+        elapsed = max(min(time.perf_counter() - self.start, self.window), 1e-6)
+
+        return {"sent/s"     : sum(sent for moment, sent, received in self.recent) / elapsed,
+                "received/s" : sum(received for moment, sent, received in self.recent) / elapsed,
+                "sent"       : self.sent,
+                "received"   : self.received}
+
+
+# Client as seen by the server
+class Peer:
+
+    def __init__(self, address, seat):
+
+        self.address = address
+        self.seat    = seat
+        self.ack      = 0
+        self.applied  = 0
+        self.received = 0
+        self.queue    = OrderedDict()
+        self.held     = ()
+        self.traffic  = Traffic()
+
+
+# Authoritative end of the connection: collects the inputs of the clients and sends them the state snapshots, each encoded
+# against the newest state the client acknowledged. The game decides the seats and runs the simulation (see `serve()` of the game)
+class GameServer:
+
+    def __init__(self, port=serverPort, host='127.0.0.1'):
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+        self.socket.setblocking(False)
+
+        self.peers   = dict()
+        self.states  = OrderedDict()
+        self.simRate = None
+
+    def receive(self):
+
+        try:
+            return self.socket.recvfrom(datagramSize)
+
+        except (BlockingIOError, ConnectionResetError):
+            return None, None
+
+    # Read all the waiting messages and return the addresses of the clients which asked to join (the caller seats them)
+    def poll(self):
+
+        joins = list()
+
+        while True:
+            data, address = self.receive()
+
+            if data is None:
+                return joins
+
+            peer = self.peers.get(address)
+
+            if peer is not None:
+                peer.traffic.count(received=len(data))
+
+            if not complete(data):
+                continue
+
+            if data[0] == JOIN:
+                if peer is None and address not in joins:
+                    joins.append(address)
+
+                # A seated client asking again did not get its WELCOME
+                elif peer is not None:
+                    self.welcome(peer)
+
+            elif data[0] == INPUT and peer is not None:
+                kind, tick, ack, held, pressed, released = inputLayout.unpack_from(data)
+
+                # Inputs arriving out of order are older than those already received
+                if tick > peer.received:
+                    peer.received    = tick
+                    peer.queue[tick] = (unpackKeys(held), unpackKeys(pressed), unpackKeys(released))
+
+                peer.ack = max(peer.ack, ack)
+
+    def seat(self, address, seat, simRate):
+
+        peer = self.peers[address] = Peer(address, seat)
+        self.simRate = simRate
+        self.welcome(peer)
+
+        return peer
+
+    def welcome(self, peer):
+        self.send(peer, welcomeLayout.pack(WELCOME, peer.seat, self.simRate))
+
+    # Input of the seat for the next step: the oldest input of the client the server did not apply yet, so the steps apply them
+    # one by one exactly as the client predicted them (see `connect()`). Inputs beyond `inputBacklog` are merged into the step
+    # (only their taps are kept) and while no input arrives the seat keeps holding its keys
+    def inputs(self, peer):
+
+        pressed = list()
+
+        while len(peer.queue) > inputBacklog:
+            peer.applied, (peer.held, tapped, released) = peer.queue.popitem(last=False)
+            pressed += tapped
+
+        if not peer.queue:
+            return TickInput(peer.held, pressed)
+
+        peer.applied, (peer.held, tapped, released) = peer.queue.popitem(last=False)
+
+        return TickInput(peer.held, pressed + list(tapped), released)
+
+    def send(self, peer, data):
+        self.socket.sendto(data, peer.address)
+        peer.traffic.count(sent=len(data))
+
+    # Send the state after the step `tick` to all the clients
+    def broadcast(self, tick, state):
+
+        self.states[tick] = state
+
+        while len(self.states) > baselineStates:
+            self.states.popitem(last=False)
+
+        held = [0] * (max([peer.seat for peer in self.peers.values()] + [-1]) + 1)
+
+        for peer in self.peers.values():
+            held[peer.seat] = packKeys(peer.held)
+
+        for peer in self.peers.values():
+            base    = peer.ack if peer.ack in self.states else 0
+            payload = encodeDelta(state, self.states[base] if base else None)
+
+            self.send(peer, stateLayout.pack(STATE, tick, base, peer.applied, len(held)) + bytes(held) + payload)
+
+    def stats(self):
+        return {peer.seat : peer.traffic.rates() for peer in self.peers.values()}
+
+
+# Client end of the connection: sends the local input of every step and decodes the states of the server
+class GameClient:
+
+    def __init__(self, host='127.0.0.1', port=serverPort):
+
+        self.address = (host, port)
+        self.socket  = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+        self.seat    = None
+        self.simRate = None
+        self.states  = OrderedDict()
+        self.latest  = 0
+        self.traffic = Traffic()
+
+    def send(self, data):
+        self.socket.sendto(data, self.address)
+        self.traffic.count(sent=len(data))
+
+    # Ask for a seat until the server answers or `timeout` seconds elapse, return the seat (None when there was no answer)
+    def join(self, timeout=5):
+
+        deadline = time.perf_counter() + timeout
+
+        while self.seat is None and time.perf_counter() < deadline:
+            self.send(joinLayout.pack(JOIN))
+            time.sleep(0.1)
+            self.poll()
+
+        return self.seat
+
+    def input(self, tick, inputs):
+        self.send(inputLayout.pack(INPUT, tick, self.latest, packKeys(inputs.held), packKeys(inputs.pressed), packKeys(inputs.released)))
+
+    # Read all the waiting messages and return the newest state received as (tick, state, applied input, held keys per seat),
+    # None when no new state arrived
+    def poll(self):
+
+        newest = None
+
+        while True:
+            try:
+                data, address = self.socket.recvfrom(datagramSize)
+
+            except (BlockingIOError, ConnectionResetError):
+                return newest
+
+            self.traffic.count(received=len(data))
+
+            if not complete(data):
+                continue
+
+            if data[0] == WELCOME:
+                kind, self.seat, self.simRate = welcomeLayout.unpack_from(data)
+
+            elif data[0] == STATE:
+                kind, tick, base, applied, seats = stateLayout.unpack_from(data)
+
+                # Late states and those encoded against a baseline the client no longer has are skipped
+                if tick <= self.latest or (base and base not in self.states):
+                    continue
+
+                held  = [unpackKeys(mask) for mask in data[stateLayout.size : stateLayout.size + seats]]
+                state = decodeDelta(data[stateLayout.size + seats:], self.states[base] if base else None)
+
+                self.states[tick] = state
+                self.latest       = tick
+
+                while len(self.states) > baselineStates:
+                    self.states.popitem(last=False)
+
+                newest = (tick, state, applied, held)
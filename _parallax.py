@@ -0,0 +1,164 @@
+import pygame
+
+from _assets import surfaces
+
+# ***********************************************                  ***********************************************
+# *********************************************** @START PARALLAX ***********************************************
+# ***********************************************                  ***********************************************
+
+
+# One copy of the layer's image on the screen. Segments are plain sprites, hence they are drawn (and interpolated)
+# by the renderers in the order of their layer together with all the other sprites
+class LayerSegment(pygame.sprite.DirtySprite):
+
+    def __init__(self, image, priority, *groups):
+
+        self._layer   = priority
+        self.image    = image
+        self.rect     = image.get_rect()
+        self.position = 0.0
+        self.spacing  = 0
+
+        pygame.sprite.DirtySprite.__init__(self, *groups)
+
+
+# Wrap-around background layer scrolled at `scrollingSpeed` pixels per step while the player moves. The layer's image
+# repeats every `spacing()` pixels: the copies are kept in a short ring of segments (two are visible at most when
+# the spacing is at least the width of the screen, plus one waiting beyond its right edge), and the segment which
+# left the screen is moved behind the last one instead of a new sprite being spawned (segments waiting in between
+# leave the groups, so they are never drawn). Only the visible part of each copy
+# (up to the next copy) is drawn, so every pixel of the layer is blitted once. Positions are kept as floats and rounded
+# only when placed on the screen, therefore any speed ratio between the layers scrolls evenly.
+# Subclasses define the speed, `start()` - left edge of the first copy, and `spacing()` - distance to the following copy
+class ParallaxLayer:
+
+    scrollingSpeed = 1
+
+    # `width` - width of the screen, `bottom` - y coordinate the bottom of the layer is aligned to
+    def __init__(self, name, *groups, priority, width, bottom):
+
+        self.name     = name
+        self.priority = priority
+        self.groups   = groups
+        self.width    = width
+        self.bottom   = bottom
+        self.image    = surfaces.get(name)
+        self.views    = dict()
+        self.segments = list()
+        self.spare    = list()
+        self.pieces   = list()
+
+        self.extend(float(self.start()))
+
+    def start(self):
+        return 0
+
+    def spacing(self):
+        return self.image.get_width()
+
+    # Part of the image shown by one copy, i.e. the image cut off where the next copy begins
+    def view(self, spacing):
+
+        width = min(self.image.get_width(), spacing)
+
+        if width not in self.views:
+            self.views[width] = self.image if width == self.image.get_width() else self.image.subsurface(pygame.Rect(0, 0, width, self.image.get_height()))
+
+        return self.views[width]
+
+    # Append copies until the last one begins beyond the right edge of the screen
+    def extend(self, position):
+
+        while not self.segments or self.segments[-1].position < self.width:
+
+            if self.segments:
+                position = self.segments[-1].position + self.segments[-1].spacing
+
+            if self.spare:
+                segment = self.spare.pop()
+                segment.add(*self.groups)
+
+            else:
+                segment = LayerSegment(self.image, self.priority, *self.groups)
+                segment.index = len(self.pieces)
+                self.pieces.append(segment)
+
+            segment.spacing  = self.spacing()
+            segment.position = position
+            segment.image    = self.view(segment.spacing)
+            segment.rect     = segment.image.get_rect(bottom=self.bottom)
+            self.place(segment)
+
+            self.segments.append(segment)
+
+    def place(self, segment):
+        segment.rect.x = round(segment.position)
+
+    def update(self, motion):
+
+        if not motion:
+            return
+
+        for segment in self.segments:
+            segment.position -= self.scrollingSpeed
+            self.place(segment)
+
+        # Recycle the copies which left the screen
+        while self.segments[0].position + self.segments[0].image.get_width() <= 0:
+            self.recycle(self.segments.pop(0))
+
+        self.extend(None)
+
+    def recycle(self, segment):
+        segment.kill()
+        self.spare.append(segment)
+
+    # Scroll the layer back to its starting position (e.g. when the game restarts)
+    def reset(self):
+
+        for segment in self.segments:
+            self.recycle(segment)
+
+        self.segments = list()
+        self.extend(float(self.start()))
+
+    # State of the layer for the game state snapshots: (index among all the segments ever created, position, spacing) of each copy
+    def capture(self):
+        return [(segment.index, segment.position, segment.spacing) for segment in self.segments]
+
+    # Copy with the given index, created as a spare one when the snapshot comes from a process which created more copies
+    def piece(self, index):
+
+        while len(self.pieces) <= index:
+            segment = LayerSegment(self.image, self.priority)
+            segment.index = len(self.pieces)
+            self.pieces.append(segment)
+            self.spare.append(segment)
+
+        return self.pieces[index]
+
+    # Copies still on the screen stay in their groups, only those which left or joined since the snapshot are recycled or brought back
+    def restore(self, copies):
+
+        kept = {self.piece(index) for index, position, spacing in copies}
+
+        for segment in self.segments:
+            if segment not in kept:
+                self.recycle(segment)
+
+        self.segments = list()
+
+        for index, position, spacing in copies:
+            segment = self.pieces[index]
+
+            if segment in self.spare:
+                self.spare.remove(segment)
+                segment.add(*self.groups)
+
+            segment.spacing  = spacing
+            segment.position = position
+            segment.image    = self.view(spacing)
+            segment.rect     = segment.image.get_rect(bottom=self.bottom)
+            self.place(segment)
+
+            self.segments.append(segment)
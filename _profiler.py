@@ -0,0 +1,130 @@
+import pygame
+import time, csv
+from collections import deque
+
+from _assets import texts
+
+# ***********************************************                   ***********************************************
+# *********************************************** @START PROFILER  ***********************************************
+# ***********************************************                   ***********************************************
+
+# Number of the most recent frames kept by the profiler
+profilerFrames = 300
+
+# Colours of the overlay's scope bars, assigned to the scopes in order of their first appearance
+profilerColours = [(230, 25, 75), (60, 180, 75), (255, 225, 25), (0, 130, 200), (245, 130, 48), (145, 30, 180), (70, 240, 240), (240, 50, 230)]
+
+
+# Frame profiler of the main loop. Timing is split into named scopes measured as laps: `mark()` starts the clock and
+# each `lap(name)` adds the time elapsed since the previous mark or lap to the scope `name` of the current frame
+# (several simulation steps within one frame add up). `frame()` closes the frame and pushes it to the ring buffer
+# together with the CPU time the process used during the frame (`cpu`, comparing it with the frame's wall time tells how busy
+# the game kept the processor, e.g. while idling in the menu). When disabled all the methods return immediately,
+# thus the calls can stay in the main loop for good
+class FrameProfiler:
+
+    def __init__(self, size=profilerFrames, enabled=False):
+
+        self.enabled = enabled
+        self.visible = False
+        self.frames  = deque(maxlen=size)
+        self.scopes  = list()
+        self.current = dict()
+        self.clock   = None
+        self.start   = None
+        self.cpu     = None
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.enabled = self.enabled or self.visible
+
+    # Close the current frame (storing its wall time, i.e. including the time spent waiting for the next frame)
+    def frame(self):
+
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        cpu = time.process_time()
+
+        if self.start is not None:
+            self.current["frame"] = (now - self.start) * 1000
+            self.current["cpu"]   = (cpu - self.cpu) * 1000
+            self.frames.append(self.current)
+
+        self.current = dict()
+        self.start   = now
+        self.cpu     = cpu
+
+    def mark(self):
+        if self.enabled:
+            self.clock = time.perf_counter()
+
+    def lap(self, name):
+
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+
+        # The profiler might have been switched on in the middle of the frame
+        if self.clock is None:
+            self.clock = now
+
+        if name not in self.current:
+            self.current[name] = 0
+
+            if name not in self.scopes:
+                self.scopes.append(name)
+
+        self.current[name] += (now - self.clock) * 1000
+        self.clock = now
+
+    # Write the buffered frames as CSV (one row per frame, one column per scope in ms) and return the path
+    def dump(self, path=None):
+
+        if path is None:
+            path = time.strftime("profile-%Y%m%d-%H%M%S.csv")
+
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["frame", "cpu"] + self.scopes)
+
+            for frame in self.frames:
+                writer.writerow(["{:.3f}".format(frame.get(scope, 0)) for scope in ["frame", "cpu"] + self.scopes])
+
+        return path
+
+    # Overlay with the graph of the frame times (the line marks the frame budget) and the bars of the scopes
+    # averaged over the buffered frames. It is returned as a surface to be blitted by the renderer
+    def overlay(self, budget, width=300, height=100):
+
+        rows    = 18 * (len(self.scopes) + 1)
+        surface = pygame.Surface((width, height + rows + 10), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 160))
+
+        if not self.frames:
+            return surface
+
+        # Graph scaled so that two frame budgets fit its height
+        scale = height / (2 * budget)
+        slot  = width / self.frames.maxlen
+
+        for index, frame in enumerate(self.frames):
+            length = min(height, frame["frame"] * scale)
+            colour = (60, 180, 75) if frame["frame"] <= budget else (230, 25, 75)
+            pygame.draw.line(surface, colour, (index * slot, height), (index * slot, height - length))
+
+        pygame.draw.line(surface, (255, 255, 255), (0, height - budget * scale), (width, height - budget * scale))
+
+        # Average time of each scope (and the CPU time), bars scaled so that a full bar is one frame budget
+        for row, scope in enumerate(self.scopes + ["cpu"]):
+            average = sum(frame.get(scope, 0) for frame in self.frames) / len(self.frames)
+            top     = height + 5 + row * 18
+            colour  = profilerColours[row % len(profilerColours)]
+
+            pygame.draw.rect(surface, colour, pygame.Rect(110, top + 3, min(width - 115, (width - 115) * average / budget), 12))
+            surface.blit(texts.render(None, 18, scope, (255, 255, 255)), (5, top))
+            surface.blit(texts.render(None, 18, "{:.1f}".format(average), (255, 255, 255)), (75, top))
+
+        return surface
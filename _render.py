@@ -0,0 +1,206 @@
+import pygame
+
+# ***********************************************                   ***********************************************
+# *********************************************** @START RENDERERS ***********************************************
+# ***********************************************                   ***********************************************
+
+# Available rendering modes:
+    # "full"  - every frame draws all the sprites, pushes the whole window and erases it with the background
+    # "dirty" - only the regions which changed since the previous frame are redrawn and pushed to the display, a frame in which
+    #           most of the screen changed (the backdrop scrolls) is drawn whole, hence the mode pays off only while the scene stands
+renderModes = ["full", "dirty"]
+
+# Longest distance (in pixels) a sprite can cover in one simulation step to be still interpolated
+interpolationLimit = 100
+
+# Share of the screen which, once covered by the sprites that changed, makes the dirty renderer draw the whole frame at once
+# (e.g. while the background layers scroll nothing stays as it was and tracking the changed regions only costs time)
+fullFrameShare = 0.5
+
+
+# Full frame renderer (the original behaviour of the main loop). Besides drawing it records the rectangles
+# of the overlays (statistics, banners) blitted directly onto the screen, so both renderers share one interface
+class FullRenderer:
+
+    def __init__(self, screen, background):
+
+        self.screen     = screen
+        self.background = background
+        self.overlays   = list()
+        self.previous   = dict()
+        self.restore    = list()
+        self.frames     = {"full" : 0, "dirty" : 0}
+
+    # Sprite group drawn by this renderer
+    def group(self):
+        return pygame.sprite.LayeredUpdates()
+
+    # Remember the centres of the sprites before the simulation step, so the frames rendered in between two steps
+    # can place the sprites proportionally between their previous and current positions
+    def snapshot(self, group):
+        self.previous = {sprite : sprite.rect.center for sprite in group.sprites()}
+
+    # Temporarily move the sprites to the interpolated positions, `alpha` is the fraction of the step (0 - previous, 1 - current)
+    # Sprites which have just appeared or jumped further than `interpolationLimit` pixels (e.g. respawned or teleported) are left intact
+    def interpolate(self, group, alpha):
+
+        if alpha >= 1:
+            return
+
+        for sprite in group.sprites():
+            previous = self.previous.get(sprite)
+
+            if previous is None:
+                continue
+
+            current = sprite.rect.center
+            dx, dy  = current[0] - previous[0], current[1] - previous[1]
+
+            if (dx or dy) and abs(dx) <= interpolationLimit and abs(dy) <= interpolationLimit:
+                self.restore.append((sprite, sprite.rect))
+                sprite.rect = sprite.rect.copy()
+                sprite.rect.center = (round(previous[0] + dx * alpha), round(previous[1] + dy * alpha))
+
+    # Put the sprites back to their simulated positions
+    def settle(self):
+
+        for sprite, rect in self.restore:
+            sprite.rect = rect
+
+        self.restore = list()
+
+    def draw(self, group, alpha=1.0):
+        self.interpolate(group, alpha)
+        group.draw(self.screen)
+        self.settle()
+        self.frames["full"] += 1
+
+    # Blit an overlay (e.g. text) directly onto the screen, above all the sprites
+    def blit(self, surface, position):
+        rect = self.screen.blit(surface, position)
+        self.overlays.append(rect)
+        return rect
+
+    # Push the frame to the display and erase the screen for the next one
+    def present(self):
+        pygame.display.update()
+        self.screen.blit(self.background, (0, 0))
+        self.overlays = list()
+
+    # Number of the frames drawn whole and region by region
+    def stats(self):
+        return dict(self.frames)
+
+    # The whole scene changed (e.g. the menu was shown or the game restarted): nothing is interpolated from the positions
+    # recorded before, the screen itself is redrawn every frame anyway
+    def invalidate(self):
+        self.previous = dict()
+
+
+# Dirty rectangle renderer built on `LayeredDirty`. Sprites are not required to flag their changes by themselves:
+# before drawing, image and rect of each sprite are compared with those of the previous frame and only the sprites
+# that moved, animated or rotated are marked dirty. `LayeredDirty` then restores the background under their old and
+# new positions, redraws every sprite intersecting these areas and returns them as the only regions to push to the display.
+# Overlays are not sprites, hence the areas they covered are repainted on the following frame. When the changed sprites cover
+# more than `fullFrameShare` of the screen (the scrolling backdrop), the frame is drawn whole and pushed as one rectangle,
+# so only the frames in which the static parts of the scene (HUD, standing sprites) dominate are drawn region by region
+class DirtyRenderer(FullRenderer):
+
+    def __init__(self, screen, background):
+        super().__init__(screen, background)
+
+        self.states  = dict()
+        self.changed = list()
+        self.layers  = None
+        self.bounds  = screen.get_rect()
+        self.limit   = fullFrameShare * self.bounds.width * self.bounds.height
+
+    def group(self):
+
+        self.layers = pygame.sprite.LayeredDirty()
+        self.layers.clear(self.screen, self.background)
+
+        return self.layers
+
+    # Mark the sprites whose image or position differs from the previous frame and return whether the frame has to be drawn
+    # whole, i.e. the changed sprites covered (before or now) more than `fullFrameShare` of the screen. The backdrop is drawn
+    # first, hence once it scrolls the frame is known to be whole right away and the rest of the sprites is not marked at all
+    def mark(self, group):
+
+        sprites  = group.sprites()
+        previous = self.states
+        changed  = 0
+        bounds   = self.bounds
+
+        # Killed sprites drop out of the dictionary here, `LayeredDirty` repaints their last area by itself
+        self.states = states = {sprite : (sprite.image, tuple(sprite.rect)) for sprite in sprites}
+
+        for sprite in sprites:
+            before = previous.get(sprite)
+
+            if before != states[sprite]:
+                if sprite.dirty == 0:
+                    sprite.dirty = 1
+
+                visible  = sprite.rect.clip(bounds)
+                changed += visible.width * visible.height
+
+                if before is not None:
+                    visible  = bounds.clip(before[1])
+                    changed += visible.width * visible.height
+
+                if changed > self.limit:
+                    return True
+
+        return False
+
+    def draw(self, group, alpha=1.0):
+
+        self.interpolate(group, alpha)
+
+        if self.mark(group):
+            self.frames["full"] += 1
+
+            # All the sprites are blitted in one call over the background, `LayeredDirty` is told where they are now (the areas
+            # it would repaint next are covered already) and none of them is dirty any more
+            sprites = group.sprites()
+
+            self.screen.blit(self.background, (0, 0))
+            group.spritedict.update(zip(sprites, self.screen.blits([(sprite.image, sprite.rect) for sprite in sprites])))
+            group.lostsprites = list()
+
+            for sprite in sprites:
+                sprite.dirty = 0
+
+            self.changed = [self.bounds]
+
+        else:
+            self.frames["dirty"] += 1
+
+            for rect in self.overlays:
+                group.repaint_rect(rect)
+
+            self.changed = group.draw(self.screen)
+
+        self.overlays = list()
+        self.settle()
+
+    def present(self):
+        pygame.display.update(self.changed + self.overlays)
+        self.changed = list()
+
+    # Repaint the whole screen on the next frame (e.g. after the menu was displayed over the game)
+    def invalidate(self):
+        super().invalidate()
+
+        if self.layers is not None:
+            self.layers.repaint_rect(self.screen.get_rect())
+
+
+# Return the renderer for the requested mode
+def createRenderer(mode, screen, background):
+
+    if mode == "dirty":
+        return DirtyRenderer(screen, background)
+
+    return FullRenderer(screen, background)
@@ -0,0 +1,76 @@
+import json
+
+from _input import TickInput
+
+# ***********************************************                ***********************************************
+# *********************************************** @START REPLAY ***********************************************
+# ***********************************************                ***********************************************
+
+# Input log format (one JSON object per line):
+    # {"seed": 1234, "simRate": 60}             - header: seed of the game's random number generator and the simulation rate
+    # {"tick": 120, "held": ["up"], "pressed": ["up", "space"], "released": ["space"]}
+    #                                           - from the simulation step `tick` on, the steps see this input (see `_input.TickInput`)
+    # {"end": 3600, "state": "5f1c..."}         - footer: number of steps of the session and the digest of its final state
+# The simulation only depends on the seed and the input of each step, so these are enough to reproduce a session
+
+
+# Writes the log while the game is being played
+class InputRecorder:
+
+    def __init__(self, path, seed, simRate):
+
+        self.file = open(path, "w")
+        self.last = None
+        self.write({"seed" : seed, "simRate" : simRate})
+
+    def write(self, entry):
+        self.file.write(json.dumps(entry) + "\n")
+
+    # Called before each step with the input the step is going to see, only changes are stored
+    def record(self, tick, inputs):
+
+        entry = inputs.state()
+
+        if entry != self.last:
+            self.last = entry
+            self.write({"tick" : tick, "held" : list(entry[0]), "pressed" : list(entry[1]), "released" : list(entry[2])})
+
+    def close(self, tick, state):
+        self.write({"end" : tick, "state" : state})
+        self.file.close()
+
+
+# Feeds the recorded input back to the main loop instead of the input layer
+class InputReplay:
+
+    def __init__(self, path):
+
+        with open(path) as file:
+            entries = [json.loads(line) for line in file if line.strip()]
+
+        self.seed    = entries[0]["seed"]
+        self.simRate = entries[0]["simRate"]
+        self.events  = {entry["tick"] : entry for entry in entries if "tick" in entry}
+        self.end     = None
+        self.state   = None
+
+        if "end" in entries[-1]:
+            self.end   = entries[-1]["end"]
+            self.state = entries[-1]["state"]
+
+    # Return the input the step `tick` has to see, i.e. the recorded one or the `current` one if nothing changed
+    def inputs(self, tick, current):
+
+        entry = self.events.get(tick)
+
+        if entry is None:
+            return current
+
+        return TickInput(entry["held"], entry["pressed"], entry["released"])
+
+    def finished(self, tick):
+        return self.end is not None and tick >= self.end
+
+    # Compare the final state of the replayed session with the recorded one
+    def check(self, state):
+        return self.state is not None and state == self.state
@@ -0,0 +1,256 @@
+import struct
+from collections import deque
+
+# ***********************************************                  ***********************************************
+# *********************************************** @START SNAPSHOTS ***********************************************
+# ***********************************************                  ***********************************************
+
+# Number of the most recent snapshots kept by the snapshot ring (i.e. how many steps the game can roll back)
+snapshotFrames = 120
+
+# Fixed layout of a snapshot (little endian, see `Snapshot`), all the blocks follow each other without any padding:
+    # header  - magic, simulation time (ms), portable flag, number of players and of statistics
+    # random  - state of the game's random generator: 625 words of the Mersenne Twister and the cached Gaussian value.
+    #           A portable snapshot holds the seed the generator was reseeded with instead (see `saveState()` of the game)
+    # stats   - state of each statistic in the order they were added
+    # layers  - for each parallax layer the number of its copies followed by (segment index, position, spacing) of each copy
+    # players - for each player: rect, life, flags (bit 0 - hit, 1 - dead, 2 - engaged), action, frame index,
+    #           angle, times of the previous and the current shot, image and original image
+    # sprites - for each kind of the pooled sprites (in the order of the game's `spriteKinds`) the number of its records
+    #           followed by one record per sprite alive: id, flags (bit 0 - reproduces itself, 1 - struck, 2 - UFO light swap
+    #           pending, 3 - abducted, 4 - integer scrolling speed, 5 - integer UFO's counter), layer, name, image,
+    #           original image, rect, scrolling speed, frame index, angle and the UFO's counter
+    # groups  - for each group (see the game's `snapshotGroups()`) the number of its members followed by their indexes
+    #           in the order of the group: 0 is the first segment of the background layers, then come the players and the records
+    # keys    - only in the portable snapshots: the keys of all the images and the names known to the registries (see `Registry`)
+    #           followed by their size. They come last, so the records keep their offsets when new keys are registered
+headerLayout = struct.Struct('<4sdBBB')
+randomLayout = struct.Struct('<625IBd')
+seedLayout   = struct.Struct('<I')
+countLayout  = struct.Struct('<B')
+sizeLayout   = struct.Struct('<H')
+copyLayout   = struct.Struct('<Bdi')
+playerLayout = struct.Struct('<iiHHiBBHhddHH')
+spriteLayout = struct.Struct('<IHbHHHiiHHdHhd')
+
+snapshotMagic = b'DF2S'
+
+
+# Two-way mapping between objects (surfaces, names) and the small integers stored in the snapshots instead of them.
+# Id 0 stands for None; the objects are kept alive by the registry, so an id always refers to the same object.
+# The ids are only valid within one process, a portable snapshot carries the keys of the objects along with it
+class Registry:
+
+    def __init__(self):
+
+        self.ids     = dict()
+        self.objects = [None]
+
+    def id(self, item):
+
+        if item is None:
+            return 0
+
+        index = self.ids.get(item)
+
+        if index is None:
+            index = self.ids[item] = len(self.objects)
+            self.objects.append(item)
+
+        return index
+
+    def get(self, index):
+        return self.objects[index]
+
+    # Key of every object in the order of their ids, e.g. `surfaceKey()` of the images (an empty string for None)
+    def keys(self, key=str):
+        return [''] + [key(item) or '' for item in self.objects[1:]]
+
+
+# Registry of another process read from a portable snapshot: the ids are those of the other process and the objects
+# are looked up in this process by their keys (through `resolve`), then remembered for the following snapshots
+class RemoteRegistry:
+
+    def __init__(self, resolve=str):
+
+        self.resolve = resolve
+        self.objects = dict()
+        self.keys    = ['']
+
+    # Keys read from the latest portable snapshot
+    def update(self, keys):
+        self.keys = keys
+
+    def get(self, index):
+
+        key = self.keys[index]
+
+        if not key:
+            return None
+
+        item = self.objects.get(key)
+
+        if item is None:
+            item = self.objects[key] = self.resolve(key)
+
+        return item
+
+
+# Single registries of the images and the names referred to by the snapshots
+surfaceIds = Registry()
+nameIds    = Registry()
+
+
+# Writer and reader of the blocks of one snapshot buffer. The game decides what goes into each block (see `saveState()`
+# and `loadState()` of the game), this class only keeps the layout: blocks are written and read strictly in the order above
+class Snapshot:
+
+    def __init__(self, buffer=None):
+
+        self.parts  = list()
+        self.buffer = buffer
+        self.offset = 0
+
+    def write(self, layout, *values):
+        self.parts.append(layout.pack(*values))
+
+    def bytes(self):
+        return b''.join(self.parts)
+
+    def read(self, layout):
+
+        values       = layout.unpack_from(self.buffer, self.offset)
+        self.offset += layout.size
+
+        return values
+
+    # Statistics are a block of `count` signed integers
+    def writeStats(self, states):
+        self.parts.append(struct.pack('<{}i'.format(len(states)), *states))
+
+    def readStats(self, count):
+
+        layout       = '<{}i'.format(count)
+        values       = struct.unpack_from(layout, self.buffer, self.offset)
+        self.offset += struct.calcsize(layout)
+
+        return values
+
+    # State returned by `random.Random.getstate()`
+    def writeRandom(self, state):
+
+        version, words, gauss = state
+        self.write(randomLayout, *words, gauss is not None, gauss or 0.0)
+
+    def readRandom(self):
+
+        values = self.read(randomLayout)
+        return (3, values[:625], values[626] if values[625] else None)
+
+    # Key tables of the registries (see `Registry.keys()`), each key prefixed with its length. The tables end the snapshot
+    # and are followed by their size, so they can be read before the blocks in front of them
+    def writeKeys(self, *tables):
+
+        parts = list()
+
+        for keys in tables:
+            parts.append(struct.pack('<H', len(keys)))
+
+            for key in keys:
+                data = key.encode('utf-8')
+                parts.append(struct.pack('<B', len(data)) + data)
+
+        data = b''.join(parts)
+        self.parts.append(data + struct.pack('<I', len(data)))
+
+    def readKeys(self, count):
+
+        size,  = struct.unpack_from('<I', self.buffer, len(self.buffer) - 4)
+        offset = len(self.buffer) - 4 - size
+        tables = list()
+
+        for i in range(count):
+            length, = struct.unpack_from('<H', self.buffer, offset)
+            offset += 2
+            keys    = list()
+
+            for j in range(length):
+                size    = self.buffer[offset]
+                keys.append(bytes(self.buffer[offset + 1 : offset + 1 + size]).decode('utf-8'))
+                offset += 1 + size
+
+            tables.append(keys)
+
+        return tables
+
+    # Block of sprite records already packed with `spriteLayout`, read back as an iterator of their values
+    def writeRecords(self, records):
+
+        self.write(sizeLayout, len(records))
+        self.parts.extend(records)
+
+    def readRecords(self):
+
+        count, = self.read(sizeLayout)
+        end    = self.offset + count * spriteLayout.size
+        values = spriteLayout.iter_unpack(memoryview(self.buffer)[self.offset : end])
+
+        self.offset = end
+
+        return values
+
+    # Members of a group as indexes into the list of the sprites the snapshot knows
+    def writeGroup(self, indexes):
+
+        self.write(sizeLayout, len(indexes))
+        self.parts.append(struct.pack('<{}H'.format(len(indexes)), *indexes))
+
+    def readGroup(self):
+
+        count,       = self.read(sizeLayout)
+        layout       = '<{}H'.format(count)
+        values       = struct.unpack_from(layout, self.buffer, self.offset)
+        self.offset += struct.calcsize(layout)
+
+        return values
+
+    # Copies of a parallax layer as returned by `ParallaxLayer.capture()`
+    def writeLayer(self, copies):
+
+        self.write(countLayout, len(copies))
+
+        for copy in copies:
+            self.write(copyLayout, *copy)
+
+    def readLayer(self):
+
+        count, = self.read(countLayout)
+        return [self.read(copyLayout) for i in range(count)]
+
+
+# Ring of the most recent snapshots keyed by the simulation step they were taken after
+class SnapshotRing:
+
+    def __init__(self, size=snapshotFrames):
+        self.entries = deque(maxlen=size)
+
+    def push(self, tick, buffer):
+        self.entries.append((tick, buffer))
+
+    def latest(self):
+        return self.entries[-1] if self.entries else None
+
+    # Return the newest snapshot taken at or before `tick` and forget all the newer ones (None if there is no such snapshot)
+    def rollback(self, tick):
+
+        while self.entries and self.entries[-1][0] > tick:
+            self.entries.pop()
+
+        return self.latest()
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {"snapshots" : len(self.entries),
+                "bytes"     : sum(len(buffer) for tick, buffer in self.entries)}
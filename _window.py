@@ -1,23 +1,78 @@
 import pygame
+import os, sys
 
 # ***********************************************                         ***********************************************
 # *********************************************** @START WINDOW SETTINGS  ***********************************************
 # ***********************************************                         ***********************************************
 
 
+# Headless mode runs the whole simulation without any window or sound card (e.g. soak tests and benchmarks on CI servers)
+# It has to be chosen before this module is imported, either through the `--headless` argument or `DOGFIGHT2D_HEADLESS=1`
+# (the server of the networked game, `--serve`, is always headless)
+headless    = "--headless" in sys.argv or "--serve" in sys.argv or os.environ.get("DOGFIGHT2D_HEADLESS", "0") == "1"
+
+# Simulation and rendering rates are independent: the game always advances in fixed steps of 1/`simRate` of a second,
+# whereas frames are rendered at most `renderRate` times per second (0 = uncapped, always the case in the headless mode)
+simRate      = 60
+renderRate   = 0 if headless else 60
+
+# Longest frame (in seconds) the simulation catches up with; the rest is dropped to avoid the spiral of death on slow machines
+maxFrameTime = 0.25
+
+# Interpolate the sprites' positions between two simulation steps when rendering in between them
+interpolate  = True
+
+# Longest time (in ms) the menu sleeps waiting for an event, the menu is only redrawn when its image changes
+menuWait     = 250
+
+
+# SDL dummy drivers still provide a display surface, therefore the sprites can be converted exactly as usual
+# but nothing is ever shown or played. They must be selected before the Pygame object is initialised
+def selectDrivers(headless):
+    if headless:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+
+# Create the display surface (an invisible one in the headless mode) and the background used to erase it
+def createWindow(resolution):
+
+    screen      = pygame.display.set_mode((resolution['width'], resolution['height']))
+    screen.fill(pygame.Color(126, 213, 234))
+
+    background  = pygame.Surface(screen.get_size())
+    background  = background.convert()
+    background.fill(pygame.Color(126, 213, 234))
+
+    pygame.mouse.set_visible(False)
+    pygame.display.set_caption("Dogfight2D (2018)")
+
+    return screen, background
+
+
 # Initialise the Pygame object
+selectDrivers(headless)
 pygame.init()
 
 
 # Initialise the window
 resolution  = {"width" : 800, "height" : 600}
 
-screen      = pygame.display.set_mode((resolution['width'], resolution['height']))
-screen.fill(pygame.Color(126, 213, 234))
+screen, background = createWindow(resolution)
+
+# Record the timing of the main loop's phases from the start (otherwise the profiler is switched on with its overlay, F3)
+profiling   = False
+
+# Keep the scrolling objects in the NumPy entity store and update them all at once (requires NumPy)
+entityStore = False
+
+# Rendering mode of the main loop, either "full" (redraw the whole window each frame) or "dirty" (redraw only changed regions).
+# While the backdrop scrolls the dirty renderer draws whole frames as well, a little slower than "full" (see benchmark.py)
+renderMode  = "full"
 
-background  = pygame.Surface(screen.get_size())
-background  = background.convert()
-background.fill(pygame.Color(126, 213, 234))
+# Keep a binary snapshot of the game state after every simulation step (the last `snapshotFrames` of them) for rollback
+snapshots   = False
 
-pygame.mouse.set_visible(False)
-pygame.display.set_caption("Dogfight2D (2018)")
\ No newline at end of file
+# Read and decode all the assets on a pool of threads before the game starts, from the packed archive when it exists
+# (see `_assets.preload`; pack it with `python run.py --pack`), otherwise the assets are loaded on their first use
+preloadAssets = True
@@ -0,0 +1,300 @@
+import environment
+
+import numpy, pygame
+import argparse, json, multiprocessing, os, random, threading, time
+from multiprocessing import shared_memory
+
+# ***********************************************               ***********************************************
+# *********************************************** @START BATCH ***********************************************
+# ***********************************************               ***********************************************
+
+# Kinds of observations written by the worlds: "state" - the state vector of the environment (see `DogfightEnv.observe()`),
+# "pixels" - the frame of the `screen` surface downscaled by `pixelScale` (width x height x RGB, as given by `pygame.surfarray`)
+observationModes = ["state", "pixels"]
+pixelScale       = 4
+
+# Commands of the runner to its worlds, written to the shared control block before the start barrier
+STOP, RESET, STEP = range(3)
+
+# Longest time (in seconds) the runner waits for the worlds to finish a round (the first one loads the assets of every world)
+barrierTimeout   = 60
+
+
+# NumPy array in a block of shared memory. The runner creates the block and the worlds attach to it by its name,
+# so the observations, actions and rewards are exchanged through the very same memory and nothing is pickled per step
+class SharedArray:
+
+    def __init__(self, shape, dtype, name=None):
+
+        self.shape  = tuple(shape)
+        self.dtype  = numpy.dtype(dtype).str
+        size        = max(1, int(numpy.prod(self.shape)) * numpy.dtype(dtype).itemsize)
+
+        self.memory = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.array  = numpy.ndarray(self.shape, dtype=dtype, buffer=self.memory.buf)
+
+    # Arguments which attach to the same block in another process
+    def spec(self):
+        return (self.shape, self.dtype, self.memory.name)
+
+    def close(self, unlink=False):
+
+        del self.array
+        self.memory.close()
+
+        if unlink:
+            self.memory.unlink()
+
+
+# Shape and type of the observation of one world
+def observationLayout(mode, scale=pixelScale):
+
+    if mode == "pixels":
+        resolution = environment.game.resolution
+        return (resolution['width'] // scale, resolution['height'] // scale, 3), numpy.uint8
+
+    return (environment.observationSize,), numpy.float32
+
+
+# Body of one world process: a headless game driven through the environment, stepped in lockstep with all the other
+# worlds. Each round starts and ends on the shared barrier, in between the world reads its command and its action and
+# writes its observation, reward and done flag straight into its row of the shared arrays. A finished episode is counted
+# (with its final score) and the world resets itself at once, so the observation of a done world is the first one of its next episode.
+# A world which fails breaks the barrier, so the runner and the other worlds do not wait for it forever
+def world(index, specs, barrier, mode, scale, repeat, limit, seed):
+
+    arrays   = dict()
+    env      = environment.DogfightEnv(repeat=repeat, limit=limit)
+    seeds    = random.Random(seed + index)
+    frame    = None
+
+    # Write the observation of the world into the shared buffer
+    def publish(observation):
+
+        if mode == "state":
+            arrays["observations"].array[index] = observation
+            return
+
+        # The rendered frame is a copy of the screen taken before the renderer erased it (see `DogfightEnv.render()`)
+        pygame.transform.scale(env.render(), frame.get_size(), frame)
+
+        pixels = pygame.surfarray.pixels3d(frame)
+        arrays["observations"].array[index] = pixels
+        del pixels
+
+    try:
+        arrays.update({name : SharedArray(*spec) for name, spec in specs.items()})
+
+        while True:
+            barrier.wait()
+            command = arrays["control"].array[0]
+
+            if command == STOP:
+                break
+
+            if command == RESET or not env.initialised:
+                observation = env.reset(seeds.randrange(2**32))
+                reward, done = 0.0, False
+
+                if frame is None and mode == "pixels":
+                    frame = pygame.Surface(arrays["observations"].shape[1:3], 0, environment.game.screen)
+
+            else:
+                observation, reward, done, info = env.step(int(arrays["actions"].array[index]))
+
+                if done:
+                    arrays["episodes"].array[index] += 1
+                    arrays["scores"].array[index]   += info["score"]
+                    observation = env.reset(seeds.randrange(2**32))
+
+            arrays["rewards"].array[index] = reward
+            arrays["dones"].array[index]   = done
+            publish(observation)
+
+            barrier.wait()
+
+    # The runner broke the barrier (e.g. another world failed), there is nothing left to do
+    except threading.BrokenBarrierError:
+        pass
+
+    except BaseException:
+        barrier.abort()
+        raise
+
+    finally:
+        for array in arrays.values():
+            array.close()
+
+
+# Runner of `worlds` independent games, one per process (the game keeps its state in the module globals, so a process
+# hosts exactly one world). `reset()` and `step(actions)` run all the worlds in lockstep and return views of the shared arrays:
+# observations (worlds x observation shape), rewards and done flags. The views are overwritten by the following round,
+# copy them to keep them. `episodes` and `scores` count the finished episodes of each world and the sum of their final scores.
+# A round which a world fails or does not finish within `barrierTimeout` raises RuntimeError, after which the runner can only be closed
+class BatchRunner:
+
+    def __init__(self, worlds, mode="state", scale=pixelScale, repeat=1, limit=None, seed=0):
+
+        if mode not in observationModes:
+            raise ValueError('Unknown observation mode: {}'.format(mode))
+
+        self.worlds  = worlds
+        shape, dtype = observationLayout(mode, scale)
+
+        self.arrays  = {"observations" : SharedArray((worlds,) + shape, dtype),
+                        "actions"      : SharedArray((worlds,), numpy.int32),
+                        "rewards"      : SharedArray((worlds,), numpy.float32),
+                        "dones"        : SharedArray((worlds,), numpy.bool_),
+                        "episodes"     : SharedArray((worlds,), numpy.int64),
+                        "scores"       : SharedArray((worlds,), numpy.int64),
+                        "control"      : SharedArray((1,), numpy.int32)}
+
+        for array in self.arrays.values():
+            array.array[...] = 0
+
+        # Processes are spawned, so every world initialises its own game instead of inheriting the SDL state of the runner
+        context       = multiprocessing.get_context("spawn")
+        specs         = {name : array.spec() for name, array in self.arrays.items()}
+        self.barrier  = context.Barrier(worlds + 1)
+        self.processes = [context.Process(target=world, args=(index, specs, self.barrier, mode, scale, repeat, limit, seed), daemon=True)
+                          for index in range(worlds)]
+
+        for process in self.processes:
+            process.start()
+
+        self.rounds  = 0
+
+    # One lockstep round of all the worlds
+    def run(self, command):
+
+        self.arrays["control"].array[0] = command
+
+        try:
+            self.barrier.wait(barrierTimeout)
+
+            if command != STOP:
+                self.barrier.wait(barrierTimeout)
+
+        except threading.BrokenBarrierError:
+            self.barrier.abort()
+
+            for process in self.processes:
+                process.join(1)
+
+            failed = [index for index, process in enumerate(self.processes) if process.exitcode not in [None, 0]]
+
+            if failed:
+                raise RuntimeError('Worlds {} failed (see their tracebacks above)'.format(failed))
+
+            raise RuntimeError('The worlds did not finish the round within {} s'.format(barrierTimeout))
+
+        if command != STOP:
+            self.rounds += 1
+
+    def reset(self):
+
+        self.run(RESET)
+        return self.arrays["observations"].array
+
+    # `actions` - action index of each world (see `actions` of the environment)
+    def step(self, actions):
+
+        self.arrays["actions"].array[:] = actions
+        self.run(STEP)
+
+        return self.arrays["observations"].array, self.arrays["rewards"].array, self.arrays["dones"].array
+
+    def close(self):
+
+        try:
+            self.run(STOP)
+
+        except RuntimeError:
+            pass
+
+        for process in self.processes:
+            process.join(barrierTimeout)
+
+            if process.is_alive():
+                process.terminate()
+
+        for array in self.arrays.values():
+            array.close(unlink=True)
+
+    def stats(self):
+        return {"worlds"   : self.worlds,
+                "rounds"   : self.rounds,
+                "episodes" : int(self.arrays["episodes"].array.sum()),
+                "scores"   : int(self.arrays["scores"].array.sum())}
+
+
+# ---------------------- SCALING BENCHMARK ----------------------
+
+# Step `worlds` worlds with random actions (a new action every few rounds) and return the simulation steps per second of all of them
+def throughput(worlds, rounds, mode, repeat, seed=0):
+
+    runner  = BatchRunner(worlds, mode=mode, repeat=repeat, seed=seed)
+    policy  = numpy.random.default_rng(seed)
+    actions = numpy.zeros(worlds, dtype=numpy.int32)
+
+    try:
+        runner.reset()
+        start = time.perf_counter()
+
+        for i in range(rounds):
+            if i % 10 == 0:
+                actions = policy.integers(len(environment.actions), size=worlds, dtype=numpy.int32)
+
+            runner.step(actions)
+
+        elapsed = time.perf_counter() - start
+
+    finally:
+        stats = runner.stats()
+        runner.close()
+
+    return {"worlds"   : worlds,
+            "rounds"   : rounds,
+            "seconds"  : elapsed,
+            "rate"     : worlds * rounds * repeat / elapsed,
+            "episodes" : stats["episodes"]}
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Dogfight2D batch runner scaling benchmark")
+    parser.add_argument("--worlds",  type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1], help="numbers of worlds to run")
+    parser.add_argument("--rounds",  type=int, default=2000,          help="lockstep rounds per run")
+    parser.add_argument("--mode",    default="state",                 help="observations written by the worlds (state or pixels)")
+    parser.add_argument("--repeat",  type=int, default=1,             help="simulation steps per round")
+    parser.add_argument("--seed",    type=int, default=0,             help="seed of the worlds and of the random policy")
+    parser.add_argument("--output",  default="batch.json",            help="JSON file the results are saved to")
+    arguments = parser.parse_args()
+
+    results = {"cores" : os.cpu_count(),
+               "mode"  : arguments.mode,
+               "time"  : time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "runs"  : list()}
+
+    print("{:>8}{:>16}{:>12}{:>12}{:>10}".format("worlds", "steps/s", "speedup", "efficiency", "episodes"))
+
+    for worlds in sorted(set(arguments.worlds)):
+        run = throughput(worlds, arguments.rounds, arguments.mode, arguments.repeat, arguments.seed)
+
+        # Scaling relative to a single world
+        base              = results["runs"][0]["rate"] / results["runs"][0]["worlds"] if results["runs"] else run["rate"] / worlds
+        run["speedup"]    = run["rate"] / base
+        run["efficiency"] = run["speedup"] / worlds
+        results["runs"].append(run)
+
+        print("{worlds:>8}{rate:>16.0f}{speedup:>12.2f}{efficiency:>12.2f}{episodes:>10}".format(**run))
+
+    with open(arguments.output, "w") as file:
+        json.dump(results, file, indent=4)
+
+    print("Results saved to {}".format(arguments.output))
+
+
+# Run the module only as a standalone program
+if __name__ == "__main__":
+    main()
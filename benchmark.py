@@ -0,0 +1,485 @@
+import dogfight2D as game
+
+import pygame
+import argparse, json, multiprocessing, queue, random, sys, time
+from collections import OrderedDict
+
+# ***********************************************                   ***********************************************
+# *********************************************** @START BENCHMARK ***********************************************
+# ***********************************************                   ***********************************************
+
+# Scripted scenarios driving the real game code (`initialisation()` and the phases of `step()` and `render()`).
+# Each frame runs exactly one simulation step and renders it without the menu and the FPS cap, measuring every
+# phase separately. Frame time percentiles of each phase are printed and saved as JSON so the runs can be compared.
+# Use `--headless` to run the suite without any window (e.g. on CI servers) and `--check` to verify instead that the optional
+# ways of running the scenarios (see `checks`) play them out exactly as the plain game does
+frames = 600
+
+# Measured phases in the order they run within a frame
+phases = ["collision", "input", "moveable.update", "layers.update", "draw", "HUD", "present"]
+
+# Snapshot loads slower than this (p50, ms) are listed after the results of `--snapshots`
+snapshotBudget = 1.0
+
+percentiles = [50, 95, 99]
+
+
+# ---------------------- SCENARIOS ----------------------
+
+# Scatter the sprite over the visible part of the sky and let the entity store know it moved
+def scatter(sprite):
+    sprite.rect.topleft = (game.rng.randint(0, game.resolution['width']), game.rng.randint(0, game.resolution['height']-200))
+    sprite.sync()
+
+
+def bombStorm(count=150):
+    for i in range(count):
+        scatter(game.pools.acquire(game.Bomb, 'bomb.png', [game.layers, game.moveable, game.dumb_enemies], priority=4))
+
+
+def denseClouds(count=600):
+    for i in range(count):
+        scatter(game.pools.acquire(game.Cloud, 'cloud{}.png'.format(game.rng.randint(1,3)), [game.layers, game.moveable], priority=game.rng.randint(-2,7)))
+
+
+# The UFO appears right above the player and starts the chase with the beam light already on the way
+def ufoChase():
+    game.ufo.rect.center = (game.player.rect.centerx, 100)
+    game.ufo.counter     = 450
+
+
+# Enemies all over the screen explode at once
+def massExplosion(count=200):
+    for i in range(count):
+        enemy = game.pools.acquire(game.Cactus, 'cactus.png', [game.layers, game.moveable, game.dumb_enemies], priority=4)
+        scatter(enemy)
+        enemy.explode()
+
+
+# Hundreds of bullets on the screen: a volley of bullets is fired each frame (bypassing the player's shot cooldown)
+def volley(count=12):
+    for i in range(count):
+        coordinates = game.player.rect.move(0, game.rng.randint(-200, 200))
+        game.pools.acquire(game.Bullet, 'bullet.png', coordinates, [game.layers, game.bullets], priority=5)
+
+
+# The game restarts in place every frame (the cost of the restart shows up in the input phase)
+def restart():
+    game.player.dead = True
+    game.handleInput(game.TickInput(pressed=["r"]))
+
+
+# Each scenario: `setup` run once after the initialisation, `hook` run before the input of each frame (measured as input)
+# and `key` held down during the whole scenario (None - no key, the player simply falls or flies on)
+scenarios = {"idle"             : {"setup" : None,          "hook" : None,   "key" : pygame.K_DOWN},
+             "scrolling"        : {"setup" : None,          "hook" : None,   "key" : None},
+             "bomb-storm"       : {"setup" : bombStorm,     "hook" : None,   "key" : pygame.K_UP},
+             "sustained-fire"   : {"setup" : None,          "hook" : volley, "key" : pygame.K_SPACE},
+             "dense-clouds"     : {"setup" : denseClouds,   "hook" : None,   "key" : pygame.K_RIGHT},
+             "ufo-chase"        : {"setup" : ufoChase,      "hook" : None,   "key" : pygame.K_UP},
+             "mass-explosion"   : {"setup" : massExplosion, "hook" : None,   "key" : None},
+             "restart"          : {"setup" : None,          "hook" : restart, "key" : pygame.K_RIGHT}}
+
+
+# ---------------------- RUNNER ----------------------
+
+# Nearest rank percentiles (and the mean) of the samples in ms
+def summarise(samples):
+
+    ordered = sorted(samples)
+    summary = {"p{}".format(p) : ordered[min(len(ordered)-1, int(round(p / 100 * (len(ordered)-1))))] for p in percentiles}
+    summary["mean"] = sum(ordered) / len(ordered)
+
+    return summary
+
+
+def run(name, mode):
+
+    scenario = scenarios[name]
+
+    # Every scenario starts from the same random layout in every mode
+    game.rng.seed(0)
+    game.renderMode = mode
+    game.initialisation()
+    pygame.mixer.music.stop()
+
+    if scenario["setup"] is not None:
+        scenario["setup"]()
+
+    if scenario["key"] is None:
+        inputs = game.TickInput()
+
+    else:
+        inputs = game.TickInput(held=[game.bindings[scenario["key"]]])
+
+    samples = {phase : list() for phase in phases + ["frame"]}
+    sizes   = list()
+
+    for frame in range(frames):
+        pygame.event.pump()
+
+        # The phases below mirror `step()` followed by `render()`
+        times = [time.perf_counter()]
+
+        game.checkCollisions()
+        times.append(time.perf_counter())
+
+        if scenario["hook"] is not None:
+            scenario["hook"]()
+
+        parallax, key = game.handleInput(inputs)
+        times.append(time.perf_counter())
+
+        game.updateMoveable(parallax)
+        times.append(time.perf_counter())
+
+        game.updateLayers(key)
+        game.finishStep()
+        times.append(time.perf_counter())
+
+        game.renderer.draw(game.layers)
+        times.append(time.perf_counter())
+
+        game.drawHud()
+        times.append(time.perf_counter())
+
+        game.renderer.present()
+        times.append(time.perf_counter())
+
+        # Optional round trip of the game state through a snapshot (`--snapshots`)
+        if "snapshot.save" in phases:
+            buffer = game.saveState()
+            times.append(time.perf_counter())
+
+            game.loadState(buffer)
+            times.append(time.perf_counter())
+
+            sizes.append((len(game.layers), len(buffer)))
+
+        for phase, start, end in zip(phases, times, times[1:]):
+            samples[phase].append((end - start) * 1000)
+
+        samples["frame"].append((times[-1] - times[0]) * 1000)
+
+    summary = {phase : summarise(values) for phase, values in samples.items()}
+
+    # Frames the renderer drew whole and region by region
+    summary["renderer"] = game.renderer.stats()
+
+    # Largest snapshot of the scenario: the sprites it holds and its size in bytes
+    if sizes:
+        summary["snapshot"] = dict(zip(["sprites", "bytes"], max(sizes)))
+
+    return summary
+
+
+# ---------------------- CONSISTENCY CHECKS ----------------------
+
+# Scripted games of the checks (`--check`): steps and seeds of each of them. Instead of the scenario's key, a key set drawn
+# at random (like a bot would) is held for `checkHold` steps. A check fails at the first step whose state digest differs
+checkSteps = 1500
+checkSeeds = [1, 2, 3]
+checkHold  = 10
+checkKeys  = [(), ("up",), ("down",), ("left",), ("right",), ("space",), ("up", "space")]
+
+# Rollbacks of the snapshot check: every `rollbackEvery` steps the state is saved, the game plays on for `rollbackDepth` steps
+# and then goes back to the saved state and plays the same steps again
+rollbackEvery = 250
+rollbackDepth = 90
+
+# Networked game of the loopback check: the client runs `loopbackLead` steps ahead of the server, which gives up when no input
+# arrives for `loopbackTimeout` seconds
+loopbackLead    = 3
+loopbackTimeout = 10
+
+
+# Start a new game of the scenario with or without the entity store
+def newGame(name, seed, store):
+
+    game.entityStore = store
+    game.rng.seed(seed)
+    game.initialisation()
+    pygame.mixer.music.stop()
+    game.isMenu = False
+
+    if scenarios[name]["setup"] is not None:
+        scenarios[name]["setup"]()
+
+
+# Inputs of each step of the scripted game of the seed
+def script(seed, steps=checkSteps):
+
+    keys    = random.Random(seed)
+    held    = ()
+    inputs  = list()
+
+    for i in range(steps):
+        if i % checkHold == 0:
+            pressed = checkKeys[keys.randrange(len(checkKeys))]
+
+        inputs.append(game.TickInput(pressed, [key for key in pressed if key not in held], [key for key in held if key not in pressed]))
+        held = pressed
+
+    return inputs
+
+
+# Play the scripted game of the seed and return the digest of the state after each step, rolling back now and then if asked
+def play(name, seed, rollback=False):
+
+    inputs   = script(seed)
+    states   = [None] * len(inputs)
+    snapshot = None
+    saved    = None
+    i        = 0
+
+    while i < len(inputs):
+
+        if rollback and i % rollbackEvery == 0 and i != saved:
+            snapshot, saved = game.saveState(), i
+
+        if snapshot is not None and i == saved + rollbackDepth:
+            game.loadState(snapshot)
+            snapshot, i = None, saved
+            continue
+
+        if scenarios[name]["hook"] is not None:
+            scenarios[name]["hook"]()
+
+        game.step(inputs[i])
+        states[i] = game.gameState()
+        i += 1
+
+    return states
+
+
+# States of the uninterrupted game, each one is played only once for all the checks
+expectations = dict()
+
+def expected(name, seed, store=False):
+
+    if (name, seed, store) not in expectations:
+        newGame(name, seed, store)
+        expectations[(name, seed, store)] = play(name, seed)
+
+    return expectations[(name, seed, store)]
+
+
+# Step at which the two runs first differ (None if they never do)
+def divergence(expected, actual):
+    return next((i for i, (left, right) in enumerate(zip(expected, actual)) if left != right), None)
+
+
+# The entity store only changes how fast the game runs: with and without it the game goes through the same states
+def checkEntityStore(name, seed):
+
+    states = expected(name, seed)
+
+    newGame(name, seed, True)
+    return divergence(states, play(name, seed))
+
+
+# Rolling back to a snapshot and playing the same steps again ends up exactly where the uninterrupted game did
+def checkSnapshots(name, seed, store=False):
+
+    states = expected(name, seed, store)
+
+    newGame(name, seed, store)
+    return divergence(states, play(name, seed, rollback=True))
+
+
+def checkStoreSnapshots(name, seed):
+    return checkSnapshots(name, seed, store=True)
+
+
+# Server of the loopback check, run in its own process: it plays the scripted game of the seed with the inputs of the client
+# which joins (one input per step, waiting for each of them) and reports the port it listens on followed by the state digest
+# after each step. The hook of the scenario is left out, the client would not replay it
+def loopbackServer(name, seed, results):
+
+    game.serving = True
+    newGame(name, seed, False)
+
+    server   = game.GameServer(0)
+    interval = max(1, game.simRate // game.sendRate)
+    tick     = 0
+    waiting  = time.perf_counter()
+
+    results.put(server.socket.getsockname()[1])
+
+    while tick < checkSteps and time.perf_counter() - waiting < loopbackTimeout:
+
+        for address in server.poll():
+            server.seat(address, len(server.peers), game.simRate)
+
+        peer = next(iter(server.peers.values()), None)
+
+        if peer is None or not peer.queue:
+            time.sleep(0.0001)
+            continue
+
+        game.step({peer.seat : server.inputs(peer)})
+        tick += 1
+
+        if tick % interval == 0:
+            server.broadcast(tick, game.saveState(portable=True))
+
+        results.put((tick, game.gameState()))
+        waiting = time.perf_counter()
+
+
+# The client of the networked game predicts the steps the server did not apply yet: right after each state of the server
+# was reconciled (see `game.reconcile()`), the client is exactly where the server is after the same step
+def checkLoopback(name, seed):
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    server  = context.Process(target=loopbackServer, args=(name, seed, results), daemon=True)
+    server.start()
+
+    try:
+        port = results.get(timeout=loopbackTimeout)
+
+        # The game of the client has nothing in common with the server's until the first state arrives
+        newGame(name, seed + 1, False)
+
+        client     = game.GameClient('127.0.0.1', port)
+        seat       = client.join()
+        interval   = max(1, game.simRate // game.sendRate)
+        expected   = dict()
+        reconciled = dict()
+        pending    = OrderedDict()
+        remote     = list()
+
+        for tick, inputs in enumerate(script(seed), 1):
+
+            while len(expected) < tick - loopbackLead:
+                done, digest = results.get(timeout=loopbackTimeout)
+                expected[done] = digest
+
+            client.input(tick, inputs)
+            pending[tick] = inputs
+            game.step(game.seatInputs(seat, inputs, remote))
+
+            state = client.poll()
+
+            if state is not None:
+                remote = game.reconcile(state, seat, pending)
+
+                # Sending a state reseeds the generator of the server (see `saveState()`), the client learns the seed only from that state
+                if tick == state[0] or tick % interval:
+                    reconciled[tick] = game.gameState()
+
+        while len(expected) < checkSteps:
+            done, digest = results.get(timeout=loopbackTimeout)
+            expected[done] = digest
+
+    # The server stopped short of the step (e.g. it applied several inputs of the client at once)
+    except queue.Empty:
+        return len(expected) + 1
+
+    finally:
+        server.terminate()
+        server.join()
+
+    # A client which never got a state did not check anything
+    if not reconciled:
+        return 0
+
+    return next((tick for tick, digest in reconciled.items() if digest != expected[tick]), None)
+
+
+checks = {"entity-store"    : checkEntityStore,
+          "snapshots"       : checkSnapshots,
+          "snapshots+store" : checkStoreSnapshots,
+          "loopback"        : checkLoopback}
+
+
+# Run every check on every scenario and seed, return whether all of them passed
+def check(names):
+
+    passed = True
+
+    for title, test in checks.items():
+        for name in names:
+            failures = {seed : step for seed in checkSeeds for step in [test(name, seed)] if step is not None}
+            passed  &= not failures
+
+            print("{:<16}{:<16}{}".format(title, name, "ok" if not failures else "differs: " + ", ".join(
+                  "seed {} at step {}".format(seed, step) for seed, step in failures.items())))
+
+    return passed
+
+
+def main():
+
+    global frames, phases
+
+    parser = argparse.ArgumentParser(description="Dogfight2D benchmark suite")
+    parser.add_argument("--headless",     action="store_true",                help="run without any window or sound")
+    parser.add_argument("--scenarios",    nargs="+", default=list(scenarios), help="scenarios to run")
+    parser.add_argument("--modes",        nargs="+", default=["full"],        help="rendering modes to run each scenario in")
+    parser.add_argument("--frames",       type=int,  default=frames,          help="frames per scenario")
+    parser.add_argument("--entity-store", action="store_true",                help="keep the scrolling objects in the entity store")
+    parser.add_argument("--snapshots",    action="store_true",                help="also save and restore the game state each frame")
+    parser.add_argument("--output",       default="benchmark.json",           help="JSON file the results are saved to")
+    parser.add_argument("--check",        action="store_true",                help="run the consistency checks of the scenarios instead")
+    arguments = parser.parse_args()
+
+    if arguments.check:
+        sys.exit(0 if check(arguments.scenarios) else 1)
+
+    frames           = arguments.frames
+    game.entityStore = arguments.entity_store
+
+    if arguments.snapshots:
+        phases = phases + ["snapshot.save", "snapshot.load"]
+
+    results = {"frames"      : frames,
+               "headless"    : game.headless,
+               "entityStore" : game.entityStore,
+               "pygame"      : pygame.version.ver,
+               "time"        : time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "scenarios"   : dict()}
+
+    columns = phases + ["frame"]
+    heavy   = list()
+    whole   = list()
+
+    print("{:<16}{:<7}".format("scenario", "mode") + "".join("{:>20}".format(phase) for phase in columns) +
+          ("{:>10}{:>10}".format("sprites", "bytes") if arguments.snapshots else ""))
+    print("{:<23}".format("") + "".join("{:>20}".format("/".join("p{}".format(p) for p in percentiles)) for phase in columns))
+
+    for name in arguments.scenarios:
+        results["scenarios"][name] = dict()
+
+        for mode in arguments.modes:
+            summary = results["scenarios"][name][mode] = run(name, mode)
+            cells   = ["/".join("{:.2f}".format(summary[phase]["p{}".format(p)]) for p in percentiles) for phase in columns]
+
+            if arguments.snapshots:
+                cells.append("{sprites:>10}{bytes:>10}".format(**summary["snapshot"]))
+
+                if summary["snapshot.load"]["p50"] > snapshotBudget:
+                    heavy.append("{} ({}, {} sprites, {:.2f} ms)".format(name, mode, summary["snapshot"]["sprites"], summary["snapshot.load"]["p50"]))
+
+            print("{:<16}{:<7}".format(name, mode) + "".join("{:>20}".format(cell) for cell in cells[:len(columns)]) + "".join(cells[len(columns):]))
+
+            if mode == "dirty":
+                whole.append("{} {}/{}".format(name, summary["renderer"]["full"], frames))
+
+    if heavy:
+        print("Snapshot loads over {} ms: {}".format(snapshotBudget, ", ".join(heavy)))
+
+    # The dirty mode gains nothing in the frames it draws whole (scrolling backdrop), there it only adds the cost of finding them
+    if whole:
+        print("Frames the dirty renderer drew whole: {}".format(", ".join(whole)))
+
+    with open(arguments.output, "w") as file:
+        json.dump(results, file, indent=4)
+
+    print("Results saved to {}".format(arguments.output))
+
+
+# Run the module only as a standalone program
+if __name__ == "__main__":
+    main()
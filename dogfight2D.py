@@ -1,19 +1,75 @@
 # Import external modules
 from _helpers import *
 from _window  import *
+from _render  import *
+from _collision import *
+from _entities  import *
+from _replay    import *
+from _profiler  import *
+from _parallax  import *
+from _input     import *
+from _snapshot  import *
+from _network   import *
+from _assets    import preload, atlas, AssetArchive, archivePath, surfaceKey, surfaceFromKey
 
-import math, random
+import math, random, hashlib, time
+from collections import OrderedDict
 
+# Random number generator owned by the game (instead of the global `random` module), seeded by `main()`
+# so that any session can be reproduced exactly, see `seed` in the main loop
+rng = random.Random()
 
-class Moveable(GameSprite):
+# Flag set by the main loop while an input log is being replayed
+replaying = False
+
+# Flag set by `serve()` while the game runs as the server of a networked game
+serving   = False
+
+# Flag set by `connect()` while the client simulates again the steps the server did not see yet
+resimulating = False
+
+# Frame profiler of the main loop, kept across restarts (F3 - show/hide the overlay, F4 - save the recorded frames as CSV)
+profiler  = FrameProfiler(enabled=profiling)
+
+# Input layer collecting every key event of the main loop (the keyboard state is meaningless without a window)
+controls  = InputLayer(polling=not headless)
+
+# Action of the player for each key in the air and on the ground
+airActions    = {"up" : "fly", "left" : "fly",  "right" : "fly",  "down" : "fall", "space" : "shoot"}
+groundActions = {"up" : "fly", "left" : "walk", "right" : "walk", "down" : "idle", "space" : "shoot"}
+
+# Sheets of the texture atlas: all the frames of the player, the explosion sequence and the clouds
+atlas.define('cowboy',    ['l_walk{}.png'.format(i) for i in range(8)] + ['r_walk{}.png'.format(i) for i in range(8)] +
+                          ['r_fly0.png', 'l_idle0.png', 'r_idle0.png', 'shoot0.png', 'shoot1.png'])
+atlas.define('explosion', ['explosion{}.png'.format(i) for i in range(9)])
+atlas.define('clouds',    ['cloud{}.png'.format(i) for i in range(1, 4)])
+
+
+class Moveable(PooledSprite):
 
     # Flag used to block newly spawned clones from infinite reproduction
     reproduceItself = True
 
+    # Entity store settings (see `entityStore` in the window settings): `slot` is the index of the sprite in the store,
+    # `always` marks the objects scrolling even when the player stands still and `edge` is the x coordinate
+    # which the right border of the object has to cross to reproduce itself (i.e. its `disappearCriteria`)
+    slot     = None
+    storable = True
+    always   = False
+    edge     = 0
+
     # Generic update method capable of handling animation of objects which should
-    # animate only when the player moves (e.g. landscape, mountains, ground), and those that should animate
+    # animate only when the player moves (e.g. cacti), and those that should animate
     # all the time (e.g. clouds, passive enemies)
     def update(self, motion=False, always=False):
+
+        # Sprites kept in the entity store were already scrolled by the store, which also tells whether they disappeared
+        if self.slot is not None:
+            if entities.disappeared(self):
+                self.respawn(self.target())
+
+            return
+
         if not always:
             if motion == True:
                 self.scroll()
@@ -32,35 +88,43 @@ class Moveable(GameSprite):
             self.rect.left -= self.scrollingSpeed
 
         # Each subclass has specific `disappearCriteria` (i.e. when new object should be replicated)
+        # and `target()` (i.e. where the clone goes, drawn only when it is needed)
         if self.disappearCriteria and self.reproduceItself == True:
+            self.respawn(self.target())
 
-            # Call spawn function on the self to create a copy of a game sprite that disappeared
-            # and place the new object on the individualy defined in a subclass `destination` tuple
-            # DEBUG print("Object: {}, Coordinates: {}".format(self.name, clonedProp.rect))
-            clonedProp      = self.spawn()
-            clonedProp.rect = clonedProp.rect.move(self.destination)
-            
-            # When clone was created set the flag back to the False to prevent infinite object creation
-            self.reproduceItself = False
+    # Replicate the disappeared sprite placing the clone on the `destination`
+    def respawn(self, destination):
 
-            # Increase newly created bombs' speed to make it more challenging
-            if isinstance(self, Bomb):
+        # Call spawn function on the self to create a copy of a game sprite that disappeared
+        # and place the new object on the individualy defined in a subclass `destination` tuple
+        # DEBUG print("Object: {}, Coordinates: {}".format(self.name, clonedProp.rect))
+        clonedProp      = self.spawn()
+        clonedProp.rect = clonedProp.rect.move(destination)
+        
+        # When clone was created set the flag back to the False to prevent infinite object creation
+        self.reproduceItself = False
 
-                # Add random fraction to the parent' speed but if it exceeds defined threshold
-                # lower it down
-                increment = random.choice([1/5, 1/4, 1/2, 1]) + self.scrollingSpeed
+        # Increase newly created bombs' speed to make it more challenging
+        if isinstance(self, Bomb):
 
-                clonedProp.scrollingSpeed = increment if increment < 12 else 5
-                
-                # DEBUG print('Parent: ', self.scrollingSpeed, 'Child: ', clonedProp.scrollingSpeed)
-
-            # Basic garbage collection: following cloning remove the old disappeared sprite 
-            # from the sprite groups it belonged to (kill()) as well as the reference (del)
-            # DEBUG print("Object killed: {}, Coordinates: {}".format(self.name, self.rect))
-            if not screen.get_rect().contains(self.rect):
-                self.kill()
-                del self  
+            # Add random fraction to the parent' speed but if it exceeds defined threshold
+            # lower it down
+            increment = rng.choice([1/5, 1/4, 1/2, 1]) + self.scrollingSpeed
+
+            clonedProp.scrollingSpeed = increment if increment < 12 else 5
             
+            # DEBUG print('Parent: ', self.scrollingSpeed, 'Child: ', clonedProp.scrollingSpeed)
+
+        # The clone was moved and possibly sped up after it had joined the entity store
+        clonedProp.sync()
+
+        # Basic garbage collection: following cloning remove the old disappeared sprite 
+        # from the sprite groups it belonged to (kill()) as well as the reference (del)
+        # DEBUG print("Object killed: {}, Coordinates: {}".format(self.name, self.rect))
+        if not screen.get_rect().contains(self.rect):
+            self.kill()
+            del self  
+        
     # Motion stop
     def stop(self):
         self.scroolSpeed = 0
@@ -68,106 +132,104 @@ class Moveable(GameSprite):
     # Flexibile method to reproduce the child objects which benefits from the special attribute `instance.__class__`. 
     # When referring `.__class__` on the `self` i.e. `self.__class__`, an instance of the class from where it was called
     # will be returned. This works because the method is inherited by all children classes and so the `self` refers to 
-    # the subclass instances, thus the subclass instance is reproduced. For instance, if the new Ground segment needs
-    # to be genereated this method will return a new Ground(...) object with the same arguments as its ancestor.
+    # the subclass instances, thus the subclass instance is reproduced. For instance, if the new Cactus needs
+    # to be genereated this method will return a new Cactus(...) object with the same arguments as its ancestor.
     # Note: it was crucial to achieve that a new object was produced and not merely a new reference to the old one
     
     # From official documentation section 9.4. Random Remarks: 
 	    # "Each value is an object, and therefore has a class (also called its type). It is stored as object.__class__."
 
+    # The clone is taken from the pool of the subclass when any killed instance is available (see `revive()`)
     def spawn(self):
-        return self.__class__(self.name, self.groups, priority=self.priority)
+        return pools.acquire(self.__class__, self.name, self.groups, priority=self.priority)
 
+    # Bring a pooled sprite back with the same arguments as the constructor: the one-off work done by the constructor
+    # (e.g. loading sounds) is skipped and only the subclass' `reset()` restores its starting image, position and state
+    def revive(self, name, *groups, priority):
 
+        self.name            = name
+        self.priority        = priority
+        self._layer          = self.priority
+        self.groups          = groups
+        self.reproduceItself = True
+        self.dirty           = 1
 
+        self.reset()
+        self.add(*groups)
+        self.register()
 
+    # Put the sprite to the entity store, if it is used. Stored sprites stay in the `moveable` group, which keeps
+    # the order of their updates, but their scrolling is done by the store for all of them at once
+    def register(self):
+        if entities is not None and self.storable:
+            entities.add(self)
 
+    # Whether the stored sprite still has to update itself each step besides being scrolled by the store
+    def busy(self):
+        return False
 
-# ***********************************************                            ***********************************************
-# *********************************************** @START GAME ASSETS CLASSES ***********************************************
-# ***********************************************                            ***********************************************
+    # Write the sprite's rect back to the entity store after the sprite moved by itself
+    def sync(self):
+        if self.slot is not None:
+            entities.place(self)
 
-# Each consecutive landscape, mountain, and ground duplicates should have the same speed so class variable can be used to ensure that
-# Each class defines only essential parameters that are specific for each child which are then handled by the parent
+    def kill(self):
+        if self.slot is not None:
+            entities.remove(self)
 
-# Importantly the update method constantly refreshes two variables: 
-    # 1) `self.disappearCriteria` which determines when the new object of the 
-    #     same kind should be reproduced (e.g. when its left or perhaps right border will cross a particular edge of the screen)
-    # 2) `self.destination` which determines where the newly reproduced instance should be position relative to the `self.disappearCriteria`
+        super().kill()
 
-# Then the responsibility of moving an object and replicating it when necessary is handled by the parent class, hence the call to super().update(motion)
-# where motion is the flag indicating if scrolling should occur or stop (for some classes it's always True, for others it changes in accordance with the player's state)
-# i.e. background elements stop scrolling when the player stop moving, but clouds and dumb enemies keep moving constantly
-class Landscape(Moveable):
 
-    scrollingSpeed = 1
 
-    def __init__(self, name, *groups, priority):
 
-        self.name      = name
-        self.priority  = priority
-        self._layer    = self.priority
-        self.groups    = groups
-        GameSprite.__init__(self, *groups)
-
-        self.resourceLoader(name)
-        self.rect.bottomleft = (0,resolution['height'])
 
-    def update(self, motion):
 
-        self.disappearCriteria = self.rect.right <= resolution['width']
-        self.direction = self.rect
-        self.destination       = (0, 0)
-        super().update(motion)
+# ***********************************************                            ***********************************************
+# *********************************************** @START GAME ASSETS CLASSES ***********************************************
+# ***********************************************                            ***********************************************
 
+# Background layers (landscape, mountains and ground) are wrap-around parallax layers (see `_parallax`): each class only defines
+# its speed, where its first copy begins (`start()`) and how far the following copy is (`spacing()`). The landscape and the ground
+# images loop seamlessly once their last screen width is reached, whereas a mountain appears again after a random distance
+class Landscape(ParallaxLayer):
 
-class Mountain(Moveable):
+    scrollingSpeed = 1
 
-    scrollingSpeed = 2
+    # The last screen width of the image repeats its beginning
+    def spacing(self):
+        return self.image.get_width() - resolution['width'] if self.image.get_width() > resolution['width'] else self.image.get_width()
 
-    def __init__(self, name, *groups, priority):
 
-        self.name      = name
-        self.priority  = priority
-        self._layer    = self.priority
-        self.groups    = groups
-        GameSprite.__init__(self, *groups)
+class Mountain(ParallaxLayer):
 
-        self.resourceLoader(name)
-        self.rect.bottomright = (resolution['width'], resolution['height'])
+    scrollingSpeed = 2
 
-    def update(self, motion):
+    def start(self):
+        return resolution['width'] - self.image.get_width()
 
-        self.disappearCriteria = self.rect.right <= 0
-        self.destination       = (resolution['width']+random.randint(0,500), 0)
-        super().update(motion)
+    # The next mountain rises from behind the right edge some time after the previous one left the screen
+    def spacing(self):
+        return 2 * resolution['width'] + rng.randint(0,500)
 
 
-class Ground(Moveable):
+class Ground(Landscape):
 
     scrollingSpeed = 12
 
-    def __init__(self, name, *groups, priority):
-
-        self.name      = name
-        self.priority  = priority
-        self._layer    = self.priority
-        self.groups    = groups
-        GameSprite.__init__(self, *groups)
-
-        self.resourceLoader(name)
-        self.rect.bottomleft = (0, resolution['height'])
-
-    def update(self, motion):
-
-        self.disappearCriteria = self.rect.right <= resolution['width']
-        self.destination       = (0, 0)
-        super().update(motion)
 
+# The remaining scrolling objects are sprites. Each class defines only essential parameters that are specific for each child
+# which are then handled by the parent, importantly the update method constantly refreshes two variables:
+    # 1) `self.disappearCriteria` which determines when the new object of the 
+    #     same kind should be reproduced (e.g. when its left or perhaps right border will cross a particular edge of the screen)
+    # 2) `self.target()` which determines where the newly reproduced instance should be position relative to the `self.disappearCriteria`
 
+# Then the responsibility of moving an object and replicating it when necessary is handled by the parent class, hence the call to super().update(motion)
+# where motion is the flag indicating if scrolling should occur or stop (for some classes it's always True, for others it changes in accordance with the player's state)
+# i.e. cacti stop scrolling when the player stops moving, but clouds and bombs keep moving constantly
 class Cloud(Moveable):
 
     # Here, scrollng speed is defined as an instance variable to randomize speed of each cloud
+    always = True
 
     def __init__(self, name, *groups, priority):
         
@@ -175,18 +237,24 @@ class Cloud(Moveable):
         self.priority   = priority
         self._layer     = self.priority
         self.groups     = groups
-        self.scrollingSpeed = random.randint(2,5)
         GameSprite.__init__(self, *groups)
 
-        self.resourceLoader(name)
-        self.rect.topright = (random.randint(resolution['width'], resolution['width']+600), random.randint(1, 250))
+        self.reset()
+        self.register()
+
+    def reset(self):
+        self.scrollingSpeed = rng.randint(2,5)
+        self.resourceLoader(self.name)
+        self.rect.topright = (rng.randint(resolution['width'], resolution['width']+600), rng.randint(1, 250))
 
     def update(self, motion):
 
-        self.disappearCriteria = self.rect.right <=0 
-        self.destination       = (resolution['width']+random.randint(0,500), 0)
+        self.disappearCriteria = self.rect.right <= self.edge
         super().update(motion=True, always=True)
 
+    def target(self):
+        return (resolution['width']+rng.randint(0,500), 0)
+
 
 class Enemy(Moveable):
 
@@ -197,6 +265,15 @@ class Enemy(Moveable):
     def __init__(self):
         self.resourceLoader('explosion.wav')
 
+    # Exploding enemies animate themselves
+    def busy(self):
+        return self.striked
+
+    # Clear the explosion state of a revived enemy
+    def reset(self):
+        self.frameIndex = 0
+        self.striked    = False
+
     # Basic method which is called from within the main loop when the player collides with the enemy
     # It sets the the `explode` flag of the striked enemy to True which used in the update method of that enemy
     # to determine if the explosion animation is to be played
@@ -207,8 +284,8 @@ class Enemy(Moveable):
     # Method used to play explosion animation following the collision with an enemy
     def animate(self):
 
-        # Contains list of surfaces returned by the wrapper of the load_image() function which applied to each element of the list
-        explosion = [self.resourceLoader(frame, output=True) for frame in ['explosion{}.png'.format((i)) for i in range(0, 9)]]
+        # Contains tuple of frames shared by all the enemies, loaded and packed into a single sprite sheet only once
+        explosion = animations.get('explosion{}.png', 9)
 
         # Increment index of the frame, check if it exceeds the size of a list and if it does than restart 
         # index and teleport the sprite outside the screen inducing its reproduction (see Moveable generic class and self.disappearCriteria condition)
@@ -216,6 +293,7 @@ class Enemy(Moveable):
         if self.frameIndex >= len(explosion):
             self.frameIndex = 0
             self.rect.x     = -500
+            self.sync()
         
         # Replace the image of the enemy for consecutive images of the explosion sequence
         self.image = explosion[self.frameIndex]
@@ -239,6 +317,7 @@ class Bomb(Enemy):
 
     scrollingSpeed = 1
     damage         = -20   
+    always         = True
 
     def __init__(self, name, *groups, priority):
         super().__init__()
@@ -247,33 +326,50 @@ class Bomb(Enemy):
         self.priority   = priority
         self._layer     = self.priority
         self.groups     = groups
-        self.angle      = 0
         GameSprite.__init__(self, *groups)
 
-        self.resourceLoader(name)
-        self.rect.center = (resolution['width']+random.randint(0, 500), resolution['height']/2)
+        self.reset()
+        self.register()
+
+        # Render all the rotated frames of the upright image upfront
+        rotations.preload(self.original)
+
+    def reset(self):
+        super().reset()
+
+        # Clones are sped up after they were revived, a bomb of a new game starts at the base speed again
+        self.scrollingSpeed = Bomb.scrollingSpeed
+        self.angle       = 0
+        self.resourceLoader(self.name)
+        self.rect.center = (resolution['width']+rng.randint(0, 500), resolution['height']/2)
+
+        # Keep the upright image as the source of all rotated frames
+        self.original    = self.image
 
     def update(self, motion):
 
-        self.disappearCriteria = self.rect.right <= 0
-        self.destination       = (resolution['width']+random.randint(0,500), random.randint(-290, 100))
+        self.disappearCriteria = self.rect.right <= self.edge
         super().update(motion=True, always=True)
 
         if not self.striked:
 
-            # `pygame.transform.rotate` creates a new rotated image each time it is called,
-            # therefore we need to apply it on the original file with increasingly bigger angle
-            # of rotation instead of attempting to rotate the rotated copy as it leads to memory issues
+            # Rotated frames are looked up in the shared rotation atlas, which renders them from the original
+            # image (never from the rotated copy) with the angle quantised to `rotations.step` degrees
 
             # From documentation: 
                 # "Some of the transforms are considered destructive. 
                 #  These means every time they are performed they lose pixel data. Common examples of this are resizing and rotating. 
                 #  For this reason, it is better to retransform the original surface than to keep transforming an image multiple times."
-            original    = self.resourceLoader(self.name, output=True)
-            center      = self.rect.center
-            self.angle += random.randint(1, 10)
-            self.image = pygame.transform.rotate(original, self.angle)
-            self.rect  = self.image.get_rect(center=center)
+            self.angle = (self.angle + rng.randint(1, 10)) % 360
+            self.image, self.rect = rotations.place(self.original, self.angle, self.rect.center)
+            self.sync()
+
+    def target(self):
+        return (resolution['width']+rng.randint(0,500), rng.randint(-290, 100))
+
+    # Bombs spin all the time
+    def busy(self):
+        return True
                     
 
 class Cactus(Enemy):
@@ -290,21 +386,32 @@ class Cactus(Enemy):
         self.groups    = groups
         GameSprite.__init__(self, *groups)
 
-        self.resourceLoader(name)
+        self.reset()
+        self.register()
+
+    def reset(self):
+        super().reset()
+
+        self.resourceLoader(self.name)
         self.rect.bottomright = (resolution['width'], resolution['height']-160)   
 
     def update(self, motion):
 
-        self.disappearCriteria = self.rect.right <= 0
-        self.destination       = (resolution['width']+random.randint(0,1000), 0)
+        self.disappearCriteria = self.rect.right <= self.edge
         super().update(motion)
 
+    def target(self):
+        return (resolution['width']+rng.randint(0,1000), 0)
+
 
 class Ufo(Enemy):
 
     scrollingSpeed  = 1
     damage          = -100   
     counter         = 700
+
+    # UFO chases the player by itself, so it is never kept in the entity store
+    storable        = False
     
 
     def __init__(self, name, *groups, priority):
@@ -314,11 +421,17 @@ class Ufo(Enemy):
         self.priority   = priority
         self._layer     = self.priority
         self.groups     = groups
-        self.counter    = 700
-        self.swap       = True
         GameSprite.__init__(self, *groups)
 
-        self.resourceLoader(name)
+        self.reset()
+        self.register()
+
+    def reset(self):
+        super().reset()
+
+        self.counter    = 700
+        self.swap       = True
+        self.resourceLoader(self.name)
         self.rect.center = (300, -500)
         self.abducted = False
     
@@ -328,20 +441,23 @@ class Ufo(Enemy):
         if not self.abducted:
 
             self.disappearCriteria = self.rect.right <= 0
-            self.destination       = (random.randint(self.image.get_size()[0], resolution['width']-self.image.get_size()[1]), 200)
             super().update(motion)
         
+            # The UFO hunts the closest player still in the game
+            prey = self.prey()
+
             #if collision between ufo and player, change the image of the UFO and 
-            if pygame.sprite.collide_rect(self, player):
+            # (pixel perfect through the cached masks, the transparent corners of the beam do not abduct anybody)
+            if collide_mask(self, prey):
                 self.resourceLoader('ufo2.png')
                 self.abducted = True
-                player.life = 0 # Sometimes the player deleted before health can be lowered
-                player.kill()
+                prey.life = 0 # Sometimes the player deleted before health can be lowered
+                prey.kill()
                     
             else:
 
                 # Define vectors for the aliens and the player
-                character = pygame.math.Vector2(player.rect.x, player.rect.y)
+                character = pygame.math.Vector2(prey.rect.x, prey.rect.y)
                 aliens    = pygame.math.Vector2(self.rect.x, self.rect.y)
         
                 # Calculate the displacement between the ufo and the player i.e. direction of movement
@@ -372,17 +488,45 @@ class Ufo(Enemy):
                     self.playSound()
                     self.resourceLoader('explosion.wav')
 
+    def target(self):
+        return (rng.randint(self.image.get_size()[0], resolution['width']-self.image.get_size()[1]), 200)
+
+    # Closest player still on the screen (the local player when nobody is left)
+    def prey(self):
+
+        hunted = [cowboy for cowboy in players if cowboy.alive()]
+
+        if not hunted:
+            return player
+
+        return min(hunted, key=lambda cowboy: (cowboy.rect.centerx - self.rect.centerx) ** 2 + (cowboy.rect.centery - self.rect.centery) ** 2)
 
-class Bullet(GameSprite):
+
+class Bullet(PooledSprite):
     
     def __init__(self, name, coordinates, *groups, priority):
         
+        self.name = name
         self.priority = priority
         self._layer = self.priority
+        self.groups = groups
         GameSprite.__init__(self, *groups)
         
         self.resourceLoader(name)
         self.rect = coordinates
+
+    # Fire a pooled bullet again from the new `coordinates`
+    def revive(self, name, coordinates, *groups, priority):
+
+        self.name     = name
+        self.priority = priority
+        self._layer   = self.priority
+        self.groups   = groups
+        self.dirty    = 1
+
+        self.resourceLoader(name)
+        self.rect = coordinates
+        self.add(*groups)
     
     # We just define argument so that it complies with the form of all other update() 
     # methods of objects belonging to the layers sprite group. This allowed bullet sprite
@@ -401,15 +545,12 @@ class Cowboy(GameSprite):
     hit  = False
     dead = False
 
-    def __init__(self, name, *groups, priority):
+    # `seat` - number of the player in the networked game (see `serve()`), each seat starts a bit further to the right
+    def __init__(self, name, *groups, priority, seat=0):
 
         self.priority       = priority
         self._layer         = self.priority
-        self.frameIndex     = 0
-        self.angle          = 0      
-        self.previous_shot  = 0  
-        self.current_shot   = pygame.time.get_ticks()
-        self.action         = "idle"
+        self.seat           = seat
        
         GameSprite.__init__(self, *groups)
 
@@ -445,11 +586,31 @@ class Cowboy(GameSprite):
                                 }
                           }
         
-        # Default action and orientation of the player
-        self.image = self.control[self.action]["right"]["play"][self.frameIndex]
-        self.rect  = self.image.get_rect(bottomleft=(0, 600-185))
+        self.reset()
         self.resourceLoader('shot.wav')
 
+    # Starting state of the player, restored in place when the game restarts (see `restart()`)
+    def reset(self):
+
+        self.life           = Cowboy.life
+        self.hit            = False
+        self.dead           = False
+        self.frameIndex     = 0
+        self.angle          = 0
+        self.previous_shot  = -1000
+        self.current_shot   = simTime
+        self.action         = "idle"
+
+        # Whether any key drove the player yet, until then the player just hovers (see `handleInput()`),
+        # and the key driving the player in the current step
+        self.engaged        = False
+        self.key            = None
+
+        # Default action and orientation of the player
+        self.image    = self.control[self.action]["right"]["play"][self.frameIndex]
+        self.original = self.image
+        self.rect     = self.image.get_rect(bottomleft=(self.seat * 60, 600-185))
+
     
     # -------------- CONTROL RELATED METHODS --------------
     
@@ -487,19 +648,19 @@ class Cowboy(GameSprite):
         ypadding = 18
         
         # Set bullet's coordinates to that of player plus padding
-        coordinates = player.rect.move(xpadding, ypadding)
+        coordinates = self.rect.move(xpadding, ypadding)
 
-        # Determine the timestamp of the current shot (ms)
-        self.current_shot = pygame.time.get_ticks()
+        # Determine the timestamp of the current shot (ms of the simulation time, so firing rate does not depend on the frame rate)
+        self.current_shot = simTime
 
         # If the previous shot was longer than 250 ms ago, create a new one
         if self.current_shot - self.previous_shot > 250:
 
             # Instantiate bullet object
-            Bullet('bullet.png', coordinates, [layers, bullets], priority=5)
+            pools.acquire(Bullet, 'bullet.png', coordinates, [layers, bullets], priority=5)
 
             # Update the `previous_shot` variable
-            self.previous_shot = pygame.time.get_ticks()
+            self.previous_shot = simTime
 
 
         # Change the player's image for the shooting pose which differs in flying and walking mode
@@ -528,10 +689,9 @@ class Cowboy(GameSprite):
             self.image = self.original
             self.hit   = False
         
-        # Otherwise update the player's image rendering its rotated form and give it a slight push off 
+        # Otherwise update the player's image looking up its rotated form in the rotation atlas and give it a slight push off 
         else:
-            self.image = pygame.transform.rotate(self.original, self.angle)
-            self.rect  = self.image.get_rect(center=center)
+            self.image, self.rect = rotations.place(self.original, self.angle, center)
             self.rect  = self.rect.move(-4, -4)
 
 
@@ -541,11 +701,15 @@ class Cowboy(GameSprite):
         # at the same time disabling any steering (flag False)
         self.fall(5, False)
 
-        myfont = pygame.font.Font("fonts/{}.ttf".format("west"), 100)
-        textsurface = myfont.render('{}'.format("GAME OVER"), True, (102,0,0))
-        screen.blit(textsurface, ((resolution['width']-textsurface.get_size()[0])/2, ((resolution['height']-textsurface.get_size()[1])-100)/2))
-        textsurface = pygame.font.Font("fonts/{}.ttf".format("horseshoeslemonade"), 40).render('{}\t\t {}'.format("Q - Quit", "R - Play"), True, (0,0,0))
-        screen.blit(textsurface, ((resolution['width']-textsurface.get_size()[0])/2, (resolution['height']-textsurface.get_size()[1]+100)/2))
+
+    # Game over screen drawn on each rendered frame (the fall itself is a part of the simulation step, see `gameover()`)
+    def gameoverScreen(self):
+
+        # Both lines never change so they are rendered once and then served from the text cache
+        textsurface = texts.render("west", 100, '{}'.format("GAME OVER"), (102,0,0))
+        renderer.blit(textsurface, ((resolution['width']-textsurface.get_size()[0])/2, ((resolution['height']-textsurface.get_size()[1])-100)/2))
+        textsurface = texts.render("horseshoeslemonade", 40, '{}\t\t {}'.format("Q - Quit", "R - Play"), (0,0,0))
+        renderer.blit(textsurface, ((resolution['width']-textsurface.get_size()[0])/2, (resolution['height']-textsurface.get_size()[1]+100)/2))
 
 
     def attacked(self, damage):
@@ -560,10 +724,10 @@ class Cowboy(GameSprite):
         self.hit  = True
             
 
+    # Every player is driven by its own key (see `handleInput()`), the key passed to the whole group is ignored
     def update(self, direction=None):
         
-        if not direction:
-            direction = "down"
+        direction = self.key or "down"
 
         # Delete sprite if the player crossed the floor i.e. upon game over
         if self.rect.y > resolution['height']:
@@ -634,22 +798,37 @@ class Stats():
         self.game_stats = list()
 
 
+    # Each statistic keeps its last rendered line under `surface`; `None` means it has to be rendered again
     def add(self, x, y, header, state=0, font="horseshoeslemonade"):
-        self.game_stats.append({"position" : (x, y), "header" : header, "font" : font, "state" : state})
+        self.game_stats.append({"position" : (x, y), "header" : header, "font" : font, "state" : state, "initial" : state, "surface" : None})
+
+
+    # Set all the statistics back to their initial values
+    def reset(self):
+        for statistic in self.game_stats:
+            if statistic['state'] != statistic['initial']:
+                statistic['state']   = statistic['initial']
+                statistic['surface'] = None
 
 
     def modify(self, stat, step):
         for statistic in self.game_stats:
             if statistic['header'] is stat:
                  change             = statistic['state'] + step
-                 statistic['state'] = change if change >= 0 else 0
+                 change             = change if change >= 0 else 0
+
+                 # Invalidate the rendered line only when the value really changed
+                 if change != statistic['state']:
+                     statistic['state']   = change
+                     statistic['surface'] = None
        
 
     def display(self):
         for statistic in self.game_stats:
-            myfont      = pygame.font.Font("fonts/{}.ttf".format(statistic['font']), 40)
-            textsurface = myfont.render('{}: {}'.format(statistic['header'], statistic['state']), True, (246, 220, 0))
-            screen.blit(textsurface, statistic['position'])
+            if statistic['surface'] is None:
+                statistic['surface'] = texts.render(statistic['font'], 40, '{}: {}'.format(statistic['header'], statistic['state']), (246, 220, 0))
+
+            renderer.blit(statistic['surface'], statistic['position'])
 
 
 
@@ -668,17 +847,37 @@ class Menu(GameSprite):
     def help(self):
          self.menu = self.resourceLoader('help.png', output=True)
 
+    # Menu loop blocking on the events (at most `menuWait` ms at a time) instead of spinning: the window is only updated
+    # when the menu's image changed or the window was exposed again. Each wake-up is a frame of the profiler, so the time
+    # spent waiting and the CPU used on this screen appear in the same profile as the gameplay
     def display(self):
         global isMenu
         
         self.main()
 
+        shown = None
+
         while isMenu:
+            profiler.frame()
+            profiler.mark()
 
-            for event in pygame.event.get():
+            if self.menu is not shown:
+                screen.blit(self.menu, (0,0))
+                pygame.display.update()
+                shown = self.menu
+                profiler.lap("menu.draw")
+
+            events = [pygame.event.wait(menuWait)] + pygame.event.get()
+            profiler.lap("menu.wait")
+
+            for event in events:
 
                 if event.type == pygame.QUIT:
                     pygame.quit()
+                    sys.exit()
+
+                if event.type in [pygame.VIDEOEXPOSE, pygame.ACTIVEEVENT]:
+                    shown = None
 
                 if event.type == pygame.MOUSEBUTTONUP:
                     isMenu = False
@@ -686,8 +885,11 @@ class Menu(GameSprite):
                 if event.type == pygame.KEYDOWN and event.key == pygame.K_h:
                     self.help()
 
-            screen.blit(self.menu, (0,0))
-            pygame.display.update()
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                    print("Profile saved to {}".format(profiler.dump()))
+
+        # The menu covered the whole game, so the dirty renderer has to repaint everything
+        renderer.invalidate()
 
 
 
@@ -699,12 +901,18 @@ class Menu(GameSprite):
 # ***********************************************                                  ***********************************************
 
 def initialisation():
-    
+
+    # Simulation time (ms) advanced by each fixed step, used instead of the wall clock for the timing of the gameplay
+    global simTime
+    simTime = 0
+
     # Instantiate menu object and its initial flag 
     global menu, isMenu
     
     menu = Menu()
-    isMenu = True
+
+    # Nobody can click through the menu in the headless mode or during the replay, so the simulation starts straight away
+    isMenu = not headless and not replaying
 
     # Game stats
     global statistics
@@ -714,50 +922,124 @@ def initialisation():
     statistics.add(resolution['width']-240, resolution['height']-50, "Health", 100)
     statistics.add(10, resolution['height']-50, "Score")
     
-    # Create sprite groups
+    # Create the renderer for the configured mode (see `renderMode` in the window settings)
+    global renderer
+    renderer = createRenderer(renderMode, screen, background)
+
+    # Sprites pooled during the previous game belong to the old groups (and so do the snapshots referring to them)
+    pools.clear()
+    history.clear()
+    mirrors.clear()
+
+    # Entity store holding the scrolling objects, if enabled (see `entityStore` in the window settings)
+    global entities
+    entities = createStore() if entityStore else None
+
+    # Create sprite groups, the layered group which draws all the sprites is provided by the renderer
     global layers, moveable, floor, dumb_enemies, bullets
 
-    layers       = pygame.sprite.LayeredUpdates()
+    layers       = renderer.group()
     moveable     = pygame.sprite.Group()
-    floor        = pygame.sprite.Group()
-    dumb_enemies = pygame.sprite.Group()
-    bullets      = pygame.sprite.Group()
+    floor        = SpatialGroup()
+    dumb_enemies = SpatialGroup()
+    bullets      = SpatialGroup()
               
     
     # Allocate game objects to sprite groups, parameters passed in the constructor are:
     # 1) name of the filename, 2) list of layers to which particular sprite object will belong to,
     # 3) priority integer which will be assigned to the instance variable self._layer provided
     # by the pygame.sprite.LayeredUpdates object which uses this variable to order the sprites' drawing
-    global landscape, mountain, ground, cactus, bomb, ufo, player, clouds
-
-    landscape   = Landscape ('background.png', [layers, moveable],                         priority=0)
-    mountain    = Mountain  ('mountain.png',   [layers, moveable],                         priority=2)
-    ground      = Ground    ('ground.png',     [layers, moveable, floor],                  priority=3)
-    cactus      = Cactus    ('cactus.png',     [layers, moveable, dumb_enemies],           priority=4)
-    bomb        = Bomb      ('bomb.png',       [layers, moveable, dumb_enemies],           priority=4)
-    ufo         = Ufo       ('ufo0.png',       [layers, moveable, dumb_enemies],           priority=4)
-    player      = Cowboy    ('',               [layers],                                   priority=5)
+    global landscape, mountain, ground, player, players
+
+    landscape   = Landscape ('background.png', layers,                                     priority=0, width=resolution['width'], bottom=resolution['height'])
+    mountain    = Mountain  ('mountain.png',   layers,                                     priority=2, width=resolution['width'], bottom=resolution['height'])
+    ground      = Ground    ('ground.png',     layers, floor,                              priority=3, width=resolution['width'], bottom=resolution['height'])
+
+    # All the players of the game (more than one only in the networked game), `player` is the one of this machine
+    players     = list()
+    player      = addPlayer()
+
+    populate()
     
+    # Backing music track not in the initialisation method since it only needs to be loaded once and loop indefinitely
+    # The file object is kept as long as the music plays, the mixer streams it
+    global music
+    music = sources.open('sounds', 'main.wav')
+    pygame.mixer.music.load(music)
+
+    # Input parameter is number of loops, -1 means indefinite loop
+    pygame.mixer.music.play(-1)
+
+    # Initialise the clock to constrain maximum FPS
+    global clock
+    clock = pygame.time.Clock()
+
+
+# Add the player of the given seat (the next free one by default) to the game
+def addPlayer(seat=None):
+
+    cowboy = Cowboy('', [layers], priority=5, seat=len(players) if seat is None else seat)
+    players.append(cowboy)
+
+    return cowboy
+
+
+# Enemies and clouds of a new game. They are taken from the pools, so only the very first game constructs them,
+# whereas a restart revives the sprites released by the previous game
+def populate():
+
+    global cactus, bomb, ufo, clouds
+
+    cactus      = pools.acquire(Cactus, 'cactus.png', [layers, moveable, dumb_enemies],   priority=4)
+    bomb        = pools.acquire(Bomb,   'bomb.png',   [layers, moveable, dumb_enemies],   priority=4)
+    ufo         = pools.acquire(Ufo,    'ufo0.png',   [layers, moveable, dumb_enemies],   priority=4)
+
     # Generate clouds (3 types cloud1.png, cloud2.png, cloud3 duplicated) using list comprehensions
     # and assign priority of drawing for each one randomly (-1, 3). As a result, some clouds will appear
     # in the background, others in foreground providing basic illusion of depth
     clouds = [
-                Cloud(
-                        'cloud{}.png'.format(random.randint(1,3)), 
+                pools.acquire(
+                        Cloud,
+                        'cloud{}.png'.format(rng.randint(1,3)), 
                         [layers, moveable], 
-                        priority=random.randint(-2,7)
+                        priority=rng.randint(-2,7)
                     )  for i in range(6)
             ]
-    
-    # Backing music track not in the initialisation method since it only needs to be loaded once and loop indefinitely
-    pygame.mixer.music.load(os.path.join('sounds', 'main.wav'))
 
-    # Input parameter is number of loops, -1 means indefinite loop
-    pygame.mixer.music.play(-1)
 
-    # Initialise the clock to constrain maximum FPS
-    global clock
-    clock = pygame.time.Clock()
+# Start a new game in place of the finished one: the groups, the renderer, the assets and the music stay as they are,
+# all the pooled sprites (enemies, clouds, bullets) return to their pools and the scene is revived from them, while
+# the player, the background layers and the statistics restore their starting state. The time it took is kept in
+# `restartTime` (ms) and reported whenever it does not fit in one simulation step
+def restart():
+
+    start = time.perf_counter()
+
+    global simTime, isMenu
+    simTime = 0
+    isMenu  = not headless and not replaying and not serving and not resimulating
+
+    for sprite in layers.sprites():
+        if isinstance(sprite, PooledSprite):
+            sprite.kill()
+
+    for layer in (landscape, mountain, ground):
+        layer.reset()
+
+    for cowboy in players:
+        cowboy.reset()
+        cowboy.add(layers)
+
+    statistics.reset()
+
+    populate()
+    renderer.invalidate()
+
+    global restartTime
+    restartTime = (time.perf_counter() - start) * 1000
+
+    if restartTime > 1000 / simRate:
+        print("Restart took {:.1f} ms, longer than one step".format(restartTime))
 
 
 
@@ -768,156 +1050,917 @@ def initialisation():
 # *********************************************** @START MAIN EVENT QUEUE ***********************************************
 # ***********************************************                         ***********************************************
 
-def main():
+# Advance the game by exactly one fixed simulation step (1/`simRate` of a second) using the step's `inputs` (see `_input`).
+# All the speeds (e.g. `scrollingSpeed`, bullet's 20 px) are expressed per step, so the gameplay runs at the same pace
+# no matter how many frames are rendered. The inputs are either those of the local player or a dictionary of the inputs
+# of every seat in the networked game (see `serve()`)
+def step(inputs):
 
-    initialisation()
+    profiler.mark()
 
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                sys.exit()
+    checkCollisions()
+    profiler.lap("collision")
 
+    parallax, key = handleInputs(inputs)
+    profiler.lap("input")
 
-        # Show menu if necessary
-        if isMenu:
-            menu.display()
+    updateMoveable(parallax)
+    profiler.lap("moveable.update")
+
+    updateLayers(key)
 
-        # Check collision against dumb enemies (i.e. those which merely goes by starting from random 
-        # locations and replicate themselves when exceed the windows's dimensions)
-        player_collision = pygame.sprite.spritecollide(player, dumb_enemies, False)
+    # Update bullets
+    #bullets.update()
+
+    finishStep()
+    profiler.lap("layers.update")
+
+
+# Phases of the simulation step, kept as separate functions so each of them can be measured on its own (see benchmark.py)
+def checkCollisions():
+
+    # Bring the spatial hashes of the collision groups up to date with the sprites' movement in the previous step
+    floor.refresh()
+    dumb_enemies.refresh()
+    bullets.refresh()
+
+    # Check collision against dumb enemies (i.e. those which merely goes by starting from random 
+    # locations and replicate themselves when exceed the windows's dimensions)
+    for cowboy in players:
+        player_collision = dumb_enemies.collide(cowboy, collided=collide_mask)
 
         if player_collision:
             for enemy in player_collision:
                 if enemy._layer > 1:
-                    player.attacked(enemy.damage)
+                    cowboy.attacked(enemy.damage)
                     enemy.explode()
                     statistics.modify("Health", enemy.damage)
 
-        # Check collisions between bullets and dumbe_enemies 
-        bullets_collision = pygame.sprite.groupcollide(bullets, dumb_enemies, True, False)
+    # Check collisions between bullets and dumbe_enemies 
+    bullets_collision = groupcollide(bullets, dumb_enemies, True, False, collide_mask)
 
-        if bullets_collision:
+    if bullets_collision:
 
-            # The method items() returns a list of dict's (key, value) tuple pairs which we extract into two variables `bullet_item` and `enemy_item`
-            # From documentation:
-                # Every Sprite inside group1 is added to the return dictionary. The value for each item is the list of Sprites in group2 that intersect.
-            for bullet_item, enemy_item in bullets_collision.items():
-                enemy_item[0].explode()   
-                statistics.modify("Score", 1)
+        # The method items() returns a list of dict's (key, value) tuple pairs which we extract into two variables `bullet_item` and `enemy_item`
+        # From documentation:
+            # Every Sprite inside group1 is added to the return dictionary. The value for each item is the list of Sprites in group2 that intersect.
+        for bullet_item, enemy_item in bullets_collision.items():
+            enemy_item[0].explode()   
+            statistics.modify("Score", 1)
 
-            
-        # Flag used to deactivate background scrolling when the player idles
-        # Resets itself back to True after each cycle
-        parallax = True   
 
-        # Variable used to store the pressed key
-        key      = None
+# Apply the inputs of the step to the players: the background scrolls when any of the players makes it scroll,
+# and the key of the last player driven by a key is passed to the sprites' update. Seats missing from the inputs
+# of the networked game just carry on as if no key was pressed
+def handleInputs(inputs):
 
-        # When the player moves (key pressed), layers of background (grouped in a sprite's group moveable) 
-        # undergo motion at various speeds whereas the player's state is modified in accordance with the type of the key pressed
-        if event.type == pygame.KEYDOWN:
-            
-            if event.key in [pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT, pygame.K_SPACE]:
-            
-                key = pygame.key.name(event.key)
+    if not isinstance(inputs, dict):
+        return handleInput(inputs, player)
 
-                # IF THE PLAYER IS FLOATING
-                if not pygame.sprite.spritecollide(player, floor, False):
+    parallax = False
+    key      = None
 
-                    # Ignore down arrow and simply fall
-                    if event.key in [pygame.K_DOWN]:
-                        player.fall()
+    for cowboy in list(players):
+        moves, driven = handleInput(inputs.get(cowboy.seat, idleInput), cowboy)
+        parallax     |= moves
+        key           = driven or key
 
-                    elif event.key in [pygame.K_SPACE]:
-                        player.shoot(True)
+    return parallax, key
 
-                    # Otherwise fly
-                    else:
-                        player.fly()
-                
-                # IF THE PLAYER IS ON THE GROUND
-                else:
 
-                    # Do nothing with the player on attempt to dig in the ground and stop parallax scrolling
-                    if event.key in [pygame.K_DOWN]:
-                        parallax = False
-                        player.idle()
-                    
-                    # Walk horizontally when left or right arrows are pressed and stop parallax scrolling
-                    elif event.key in [pygame.K_LEFT, pygame.K_RIGHT]:
-                        parallax = False
-                        player.walk()
-                    
-                    # Otherwise (i.e. K_UP), begin to fly
-                    elif event.key in [pygame.K_UP]:
-                        player.fly()
-                    
-                    else:
-                        parallax = False
-                        player.shoot()
+# Input of a seat which sent nothing
+idleInput = TickInput()
 
-            # IF THE PLAYER'S DIED AND THE R WAS PRESSED, PLAY AGAIN
-            elif event.key in [pygame.K_r] and player.dead:
-                player.dead = False
-                initialisation()
 
-            # IF THE PLAYER'S DIED AND THE Q WAS PRESSED, QUIT
-            elif event.key in [pygame.K_q] and player.dead:
-                sys.exit()
+# Whether all the players are dead, i.e. the game is over
+def gameOver():
+    return all(cowboy.dead for cowboy in players)
+
+
+# Apply the player's input and return the `parallax` flag and the name of the `key` driving the player for the sprites' update.
+# Every key held or tapped within the step contributes its action to the step's action set (`fly`, `walk`, `shoot`, `fall`, `idle`),
+# firing takes precedence over moving, otherwise the most recently pressed key decides what the player does
+def handleInput(inputs, cowboy=None):
+
+    cowboy = cowboy or player
+
+    # Flag used to deactivate background scrolling when the player idles
+    # Resets itself back to True after each cycle
+    parallax = True
+
+    # Variable used to store the key driving the player
+    key      = None
 
-        # When the button is released, parallax effect ceases whereas player remains unchanged at this point
-        elif event.type == pygame.KEYUP:
+    # IF THE PLAYER'S DIED AND THE R WAS PRESSED, PLAY AGAIN (once all the players died)
+    if "r" in inputs.pressed and cowboy.dead and gameOver():
+        restart()
 
-            # If the player is in the air and the keyboard is not used gradual fall should occur    
-            if not pygame.sprite.spritecollide(player, floor, False):
-                player.fall()
+    # IF THE PLAYER'S DIED AND THE Q WAS PRESSED, QUIT (the server keeps running for the other players)
+    elif "q" in inputs.pressed and cowboy.dead and not serving:
+        sys.exit()
 
-            # If the player is on the ground and the keyboard is not used player should idle
+    grounded = floor.collide(cowboy)
+    table    = groundActions if grounded else airActions
+    keys     = [name for name in inputs.keys() if name in table]
+    actions  = {table[name] : name for name in keys}
+
+    # When the player moves (key held), layers of background undergo motion at various speeds
+    # whereas the player's state is modified in accordance with the action
+    if actions:
+        cowboy.engaged = True
+        key            = actions["shoot"] if "shoot" in actions else keys[-1]
+        action  = table[key]
+
+        # IF THE PLAYER IS FLOATING
+        if not grounded:
+
+            # Shoot while passively falling
+            if action == "shoot":
+                cowboy.shoot(True)
+
+            # Ignore down arrow and simply fall
+            elif action == "fall":
+                cowboy.fall()
+
+            # Otherwise fly
             else:
+                cowboy.fly()
+
+        # IF THE PLAYER IS ON THE GROUND
+        else:
+
+            # Do nothing with the player on attempt to dig in the ground and stop parallax scrolling
+            if action == "idle":
                 parallax = False
-                player.idle()
-                
+                cowboy.idle()
 
-                
-        # ---------------------- UPDATE ALL SPRITE GROUPS INDIVIDUALLY PASSING OPTIONAL PARAMETERS ----------------------
+            # Walk horizontally when left or right arrows are pressed and stop parallax scrolling
+            elif action == "walk":
+                parallax = False
+                cowboy.walk()
+
+            # Otherwise (i.e. up arrow), begin to fly
+            elif action == "fly":
+                cowboy.fly()
+
+            else:
+                parallax = False
+                cowboy.shoot()
+
+    # Once the keys are released the parallax effect ceases (nothing happens before the very first key of the game)
+    elif cowboy.engaged:
+
+        # If the player is in the air and the keyboard is not used gradual fall should occur
+        if not grounded:
+            cowboy.fall()
+
+        # If the player is on the ground and the keyboard is not used player should idle
+        else:
+            parallax = False
+            cowboy.idle()
+
+    cowboy.key = key
+
+    return parallax, key
+            
+
+# ---------------------- UPDATE ALL SPRITE GROUPS INDIVIDUALLY PASSING OPTIONAL PARAMETERS ----------------------
+
+def updateMoveable(parallax):
+
+    # Scroll the background layers
+    for layer in (landscape, mountain, ground):
+        layer.update(parallax)
 
-        # Update the background
+    # Update the remaining scrolling objects
+    if entities is None:
         moveable.update(parallax)
 
-        # Update all sprites belonging to the `layers` group (i.e. landscape, mountain, ground, clouds)
-        # Pass the key name to the update() method which handles animation playback and reposition
+    # Scroll all the stored objects at once (cacti only when `parallax` is on), then update the rest in the order of the group
+    else:
+        entities.scroll(parallax)
+        updateUnstored(moveable, parallax)
+
+
+def updateLayers(key):
+
+    # Update all sprites belonging to the `layers` group (i.e. player, clouds, enemies, bullets)
+    # Pass the key name to the update() method which handles animation playback and reposition
+    if entities is None:
         layers.update(key)
 
-        # Update bullets
-        #bullets.update()
+    # The second update only scrolls the stored objects which move all the time (see `Cactus.update()`)
+    else:
+        entities.scroll()
+        updateUnstored(layers, key)
 
 
-        # ---------------------- DRAW ALL SPRITES ----------------------
-        layers.draw(screen) 
-        #bullets.draw(screen)
-        
+# Update the sprites of the group the entity store did not update on its own: the sprites outside the store and the stored ones
+# which disappeared in the store's last pass or are busy (e.g. spinning or exploding). They update in the order of the group
+# as many times as they would without the store, so both ways draw the same random numbers and the game plays out the same
+def updateUnstored(group, *arguments):
 
-        # Display statistics (score & health)
-        statistics.display()
+    leaving = entities.leaving
 
-        if player.dead:
-            player.gameover()
-        
-        # UFO on the way!
-        if ufo.counter < 400 and ufo.counter > 300:
-            myfont = pygame.font.Font("fonts/{}.ttf".format("west"), 30)
-            textsurface = myfont.render('{}'.format("THEY'VE SEEN YOU!"), True, (102,0,0))
-            screen.blit(textsurface, ((resolution['width']-textsurface.get_size()[0])/2, (resolution['height']-textsurface.get_size()[1])/2))
-            textsurface = myfont.render('{}'.format("FLY FORWARD AND TAKE THEM FROM THE BACK!"), True, (102,0,0))
-            screen.blit(textsurface, ((resolution['width']-textsurface.get_size()[0])/2, ((resolution['height']-textsurface.get_size()[1])+80)/2))
+    for sprite in group.sprites():
+        if getattr(sprite, 'slot', None) is None or sprite in leaving or sprite.busy():
+            sprite.update(*arguments)
+
+
+
+def finishStep():
+
+    # Let the dead players fall off the screen
+    for cowboy in players:
+        if cowboy.dead:
+            cowboy.gameover()
+
+    # Advance the simulation clock by one fixed step
+    global simTime
+    simTime += 1000 / simRate
+
+
+# Render one frame, `alpha` (0-1) is the fraction of the next simulation step which already elapsed and is used
+# to interpolate the sprites' positions between the last two steps
+def render(alpha=1.0):
+
+    profiler.mark()
+
+    # ---------------------- DRAW ALL SPRITES ----------------------
+    renderer.draw(layers, alpha)
+    #bullets.draw(screen)
+    profiler.lap("draw")
+
+    drawHud()
+    profiler.lap("hud")
+
+    # Profiler overlay in the top left corner, the frame budget is given by the render rate (or the simulation rate when uncapped)
+    if profiler.visible:
+        renderer.blit(profiler.overlay(1000 / (renderRate or simRate)), (10, 10))
+        profiler.lap("profiler")
+
+    # Update the screen (whole or only the changed regions, depending on the renderer) and erase
+    renderer.present()
+    profiler.lap("present")
+
+
+# Statistics, game over screen and the UFO warning drawn above all the sprites
+def drawHud():
+
+    # Display statistics (score & health)
+    statistics.display()
+
+    if gameOver():
+        player.gameoverScreen()
+    
+    # UFO on the way!
+    if ufo.counter < 400 and ufo.counter > 300:
+        textsurface = texts.render("west", 30, '{}'.format("THEY'VE SEEN YOU!"), (102,0,0))
+        renderer.blit(textsurface, ((resolution['width']-textsurface.get_size()[0])/2, (resolution['height']-textsurface.get_size()[1])/2))
+        textsurface = texts.render("west", 30, '{}'.format("FLY FORWARD AND TAKE THEM FROM THE BACK!"), (102,0,0))
+        renderer.blit(textsurface, ((resolution['width']-textsurface.get_size()[0])/2, ((resolution['height']-textsurface.get_size()[1])+80)/2))
+
+
+
+# Progress bar of the asset preload drawn straight onto the window (the renderer does not exist yet)
+def loadingScreen(done, total):
+
+    # Keep the window responsive while loading
+    pygame.event.pump()
+
+    width = resolution['width'] // 2
+    frame = pygame.Rect((resolution['width'] - width) // 2, resolution['height'] // 2, width, 20)
+
+    screen.blit(background, (0, 0))
+    pygame.draw.rect(screen, (102,0,0), frame, 2)
+    pygame.draw.rect(screen, (102,0,0), pygame.Rect(frame.x + 4, frame.y + 4, (width - 8) * done // total, 12))
+
+    textsurface = texts.render(None, 30, 'LOADING {}/{}'.format(done, total), (102,0,0))
+    screen.blit(textsurface, ((resolution['width']-textsurface.get_size()[0])/2, frame.y - 40))
+
+    pygame.display.flip()
+
+
+# Actions of the player in the order of their codes within the snapshots
+playerActions = ["idle", "walk", "fly", "shoot"]
+
+# Kinds of the pooled sprites in the order of their codes within the snapshots
+spriteKinds   = [Cloud, Cactus, Bomb, Ufo, Bullet]
+
+# Registries of the server's images and names, read from the portable snapshots it sends (see `connect()`)
+remoteImages  = RemoteRegistry(surfaceFromKey)
+remoteNames   = RemoteRegistry()
+
+# Sprites of this process standing for the sprites of the server, keyed by the server's sprite ids
+mirrors       = dict()
+
+
+# Groups a pooled sprite of the given kind belongs to
+def spriteGroups(kind):
+
+    if kind is Cloud:
+        return [layers, moveable]
+
+    if kind is Bullet:
+        return [layers, bullets]
+
+    return [layers, moveable, dumb_enemies]
+
+
+# Groups whose members and their order are kept by the snapshots (the order of the updates decides which sprite gets which random number)
+def snapshotGroups():
+    return [layers, floor, moveable, dumb_enemies, bullets]
+
+
+# Every sprite the groups of a snapshot may refer to, the groups store the indexes of their members in this list:
+# the segments of the background layers, the players and the pooled sprites in the order of their records
+def snapshotMembers(sprites):
+    return [segment for layer in (landscape, mountain, ground) for segment in layer.segments] + players + sprites
+
+
+# Capture the whole simulation state into a compact binary snapshot (see `_snapshot` for its layout). Only the state
+# which the following steps depend on is stored; sprites are referred to by their pool ids and images by their registry ids.
+# A `portable` snapshot also carries the keys of the images and names, so it can be loaded by another process (see `serve()`)
+def saveState(portable=False):
+
+    snapshot = Snapshot()
+    kinds    = {kind : list() for kind in spriteKinds}
+    images   = surfaceIds.id
+    records  = list()
+
+    for sprite in layers.sprites():
+        kind = kinds.get(sprite.__class__)
+
+        if kind is not None:
+            kind.append(sprite)
+
+    # Images and names are registered while the records are built, hence the keys follow once all of them are known
+    for cowboy in players:
+        records.append(playerLayout.pack(cowboy.rect.x, cowboy.rect.y, cowboy.rect.width, cowboy.rect.height, cowboy.life,
+                                         cowboy.hit | cowboy.dead << 1 | cowboy.engaged << 2, playerActions.index(cowboy.action),
+                                         cowboy.frameIndex, cowboy.angle, cowboy.previous_shot, cowboy.current_shot,
+                                         images(cowboy.image), images(cowboy.original)))
+
+    # Records of each kind form one block, so the loader knows the kind of the whole block
+    blocks = list()
+
+    for code, kind in enumerate(spriteKinds):
+        block = list()
+
+        for sprite in kinds[kind]:
+            speed   = getattr(sprite, 'scrollingSpeed', 0)
+            counter = getattr(sprite, 'counter', 0)
+            flags   = (getattr(sprite, 'reproduceItself', False) | getattr(sprite, 'striked', False) << 1 | getattr(sprite, 'swap', False) << 2 |
+                       getattr(sprite, 'abducted', False) << 3 | isinstance(speed, int) << 4 | isinstance(counter, int) << 5)
+
+            block.append(spriteLayout.pack(sprite.uid, flags, sprite._layer, nameIds.id(sprite.name), images(sprite.image),
+                                           images(getattr(sprite, 'original', None)), sprite.rect.x, sprite.rect.y, sprite.rect.width,
+                                           sprite.rect.height, speed, getattr(sprite, 'frameIndex', 0), getattr(sprite, 'angle', 0), counter))
+
+        blocks.append(block)
+
+    snapshot.write(headerLayout, snapshotMagic, simTime, portable, len(players), len(statistics.game_stats))
+
+    # The whole state of the generator changes every 624 draws, the receiver of a portable snapshot is given a fresh seed
+    # of the generator instead (both ends carry on from the same state, the sender is reseeded as well)
+    if portable:
+        seed = rng.getrandbits(32)
+        rng.seed(seed)
+        snapshot.write(seedLayout, seed)
+
+    else:
+        snapshot.writeRandom(rng.getstate())
+    snapshot.writeStats([statistic['state'] for statistic in statistics.game_stats])
+
+    for layer in (landscape, mountain, ground):
+        snapshot.writeLayer(layer.capture())
+
+    snapshot.parts.extend(records)
+
+    for block in blocks:
+        snapshot.writeRecords(block)
+
+    members = snapshotMembers([sprite for kind in spriteKinds for sprite in kinds[kind]])
+    index   = {sprite : i for i, sprite in enumerate(members)}
+
+    for group in snapshotGroups():
+        snapshot.writeGroup(list(map(index.__getitem__, group.sprites())))
+
+    if portable:
+        snapshot.writeKeys(surfaceIds.keys(surfaceKey), nameIds.keys())
+
+    return snapshot.bytes()
+
+
+# Sprite of this process standing for the sprite of another process with the given id: a sprite of the same kind
+# taken from the pool (see `mirrors`), the same one as long as the other process keeps its sprite
+def mirrorSprite(uid, kind, name, layer):
+
+    sprite = mirrors.get(uid)
+
+    if sprite is None or sprite.__class__ is not kind:
+        sprite = pools.acquire(kind, name, pygame.Rect(0, 0, 0, 0), spriteGroups(kind), priority=layer) if kind is Bullet else \
+                 pools.acquire(kind, name, spriteGroups(kind), priority=layer)
+
+        # A sprite mirrors one sprite of the other process at a time
+        mirrors.pop(getattr(sprite, 'mirror', None), None)
+        mirrors[uid]  = sprite
+        sprite.mirror = uid
+
+        return sprite
+
+    return pools.find(sprite.uid)
+
+
+# Make the members of the group and their order those of the list. The group is kept up to the first difference and the rest
+# of it joins again in the order of the list, hence nothing at all happens when the group did not change since the snapshot
+def regroup(group, members):
+
+    current = group.sprites()
+
+    if current == members:
+        return
+
+    start = next((i for i, (sprite, member) in enumerate(zip(current, members)) if sprite is not member), min(len(current), len(members)))
+
+    group.remove(*current[start:])
+    group.add(*members[start:])
+
+
+# Bring the game back to the state captured by `saveState()` within the same game (the pools keep every sprite it refers to),
+# or to the state of another process from a portable snapshot. Sprites alive in the snapshot are brought back from the pool
+# when needed, the others return to the pool, and every group gets back its members in their order. Players missing from
+# the game (e.g. a client receiving the state of the server, see `connect()`) are added, those the snapshot lacks are removed
+def loadState(buffer):
+
+    global simTime, ufo
+
+    snapshot = Snapshot(buffer)
+    magic, simTime, portable, seats, stats = snapshot.read(headerLayout)
+
+    if magic != snapshotMagic:
+        raise ValueError('Not a game state snapshot')
+
+    images, names = surfaceIds, nameIds
+
+    # The generator is restored last, reviving sprites may draw random numbers
+    if portable:
+        keys, names = snapshot.readKeys(2)
+        remoteImages.update(keys)
+        remoteNames.update(names)
+        images, names = remoteImages, remoteNames
+
+        seed, = snapshot.read(seedLayout)
+
+    else:
+        generator = snapshot.readRandom()
+
+    for statistic, state in zip(statistics.game_stats, snapshot.readStats(stats)):
+        if statistic['state'] != state:
+            statistic['state']   = state
+            statistic['surface'] = None
+
+    for layer in (landscape, mountain, ground):
+        layer.restore(snapshot.readLayer())
+
+    while len(players) < seats:
+        addPlayer()
+
+    for cowboy in players[seats:]:
+        cowboy.kill()
+
+    del players[seats:]
+
+    image, name, find, Rect = images.get, names.get, pools.find, pygame.Rect
+
+    for cowboy in players:
+        x, y, width, height, cowboy.life, flags, action, cowboy.frameIndex, cowboy.angle, cowboy.previous_shot, cowboy.current_shot, picture, original = snapshot.read(playerLayout)
+
+        cowboy.hit      = bool(flags & 1)
+        cowboy.dead     = bool(flags & 2)
+        cowboy.engaged  = bool(flags & 4)
+        cowboy.action   = playerActions[action]
+        cowboy.image    = image(picture)
+        cowboy.original = image(original)
+        cowboy.rect     = Rect(x, y, width, height)
+
+    # What differs between the kinds is decided once per block, the records themselves only assign the values
+    sprites = list()
+    movers  = list()
+
+    for kind in spriteKinds:
+        moves   = issubclass(kind, Moveable)
+        fights  = issubclass(kind, Enemy)
+
+        for uid, flags, layer, label, picture, original, x, y, width, height, speed, frameIndex, angle, counter in snapshot.readRecords():
+            sprite = mirrorSprite(uid, kind, name(label), layer) if portable else find(uid)
+            sprites.append(sprite)
+
+            if sprite._layer != layer:
+                if sprite.alive():
+                    layers.change_layer(sprite, layer)
+
+                sprite._layer = sprite.priority = layer
+
+            sprite.image = image(picture)
+            sprite.rect  = Rect(x, y, width, height)
+
+            if label:
+                sprite.name = name(label)
+
+            if original:
+                sprite.original = image(original)
+
+            if moves:
+                movers.append(sprite)
+
+                sprite.reproduceItself = bool(flags & 1)
+                sprite.frameIndex      = frameIndex
+
+                # Speeds and counters are kept as they were (e.g. 4 and not 4.0), so the game goes on exactly as it would have
+                sprite.scrollingSpeed  = int(speed) if flags & 16 else speed
+
+            if fights:
+                sprite.striked = bool(flags & 2)
+
+            if kind is Bomb:
+                sprite.angle = angle
+
+            elif kind is Ufo:
+                sprite.swap     = bool(flags & 4)
+                sprite.abducted = bool(flags & 8)
+                sprite.counter  = int(counter) if flags & 32 else counter
+                ufo             = sprite
+
+    members = snapshotMembers(sprites)
+    groups  = [(group, list(map(members.__getitem__, snapshot.readGroup()))) for group in snapshotGroups()]
+    alive   = set(sprites)
+
+    for sprite in layers.sprites():
+        if sprite not in alive and isinstance(sprite, PooledSprite):
+            sprite.kill()
+
+    for group, members in groups:
+        regroup(group, members)
+
+    # Sprites brought back from the pool join the entity store, all the stored ones copy their new state to it at once
+    if entities is not None:
+        for sprite in movers:
+            if sprite.slot is None and sprite.storable:
+                entities.add(sprite)
+
+        entities.load([sprite for sprite in movers if sprite.slot is not None])
+
+    if portable:
+        rng.seed(seed)
+
+    else:
+        rng.setstate(generator)
+
+    renderer.invalidate()
+
+
+# Snapshot of the state after every step when `snapshots` is on (see the window settings), for rollback
+history = SnapshotRing()
+
+
+# Go back to the newest snapshot taken at or before the step `tick`, return the step it was taken after (None if there is none)
+def rollback(tick):
+
+    entry = history.rollback(tick)
+
+    if entry is None:
+        return None
+
+    loadState(entry[1])
+    return entry[0]
+
+
+# Digest of the simulation state (clock, player, statistics, every sprite's position and the random generator)
+# used to verify that a replayed session ended up exactly where the recorded one did
+def gameState():
+
+    state = [simTime, player.life, player.dead, tuple(player.rect), rng.getstate()]
+    state += [(statistic['header'], statistic['state']) for statistic in statistics.game_stats]
+    state += [(sprite.__class__.__name__, tuple(sprite.rect)) for sprite in layers.sprites()]
+
+    return hashlib.sha1(repr(state).encode()).hexdigest()
+
+
+# Fixed timestep main loop: the real time elapsed since the previous frame is accumulated and consumed in fixed steps,
+# hence a slow frame runs several steps to catch up (up to `maxFrameTime`) while a fast machine renders at `renderRate`
+# interpolating between the steps. In the headless mode exactly one step is run per frame as fast as possible.
+# Optional parameters:
+    # `frames` - stops the game after the given number of frames (e.g. headless soak tests), otherwise it runs forever
+    # `seed`   - seed of the game's random generator, a fresh one is drawn when not given
+    # `record` - path of the input log (see `_replay`) the session is recorded to
+    # `replay` - path of the input log to play back: its seed and inputs replace the real input, one step per frame
+    #            with no cap (use together with the headless mode), and the final state is checked against the log.
+    #            Returns True when the replay ended in the recorded state
+def main(frames=None, seed=None, record=None, replay=None):
+
+    global replaying
+
+    log       = InputReplay(replay) if replay else None
+    replaying = log is not None
+
+    # The steps of a log recorded at another simulation rate are not the same steps, such a log can never match
+    if replaying and log.simRate != simRate:
+        print("Replay {}: recorded at {} steps/s, the game runs at {} steps/s".format(replay, log.simRate, simRate))
+        return False
+
+    if replaying:
+        seed = log.seed
+
+    elif seed is None:
+        seed = random.randrange(2**32)
+
+    rng.seed(seed)
+    recorder = InputRecorder(record, seed, simRate) if record else None
+
+    if preloadAssets:
+        sources.useArchive()
+        preload(progress=loadingScreen)
+
+    initialisation()
+
+    frame       = 0
+    tick        = 0
+    dt          = 1 / simRate
+    accumulator = 0
+
+    # Input of the last step, the replay only stores its changes
+    inputs = TickInput()
+
+    try:
+
+        while frames is None or frame < frames:
+            frame += 1
+            profiler.frame()
+
+            if replaying and log.finished(tick):
+                break
+
+            # Real input is ignored during the replay, apart from closing the window
+            for received in pygame.event.get():
+                if received.type == pygame.QUIT:
+                    sys.exit()
+
+                # Profiler keys are handled here and never reach the game (nor the input log)
+                if received.type == pygame.KEYDOWN and received.key in [pygame.K_F3, pygame.K_F4]:
+                    if received.key == pygame.K_F3:
+                        profiler.toggle()
+
+                    else:
+                        print("Profile saved to {}".format(profiler.dump()))
+                        print("Input latency (ms): {}".format(controls.stats()))
+
+                    continue
+
+                if not replaying:
+                    controls.collect(received)
+
+
+            # Show menu if necessary
+            if isMenu:
+                menu.display()
+
+                # Time spent in the menu must not be simulated
+                clock.tick()
+                accumulator = 0
+
+            # Track how long the previous frame took and cap the render rate at `renderRate` (0 = uncapped)
+            elapsed = clock.tick(renderRate) / 1000
+
+            if headless or replaying:
+                elapsed = dt
+
+            # Drop the time exceeding `maxFrameTime` instead of trying to catch up with it forever
+            accumulator += min(elapsed, maxFrameTime)
+
+            while accumulator >= dt:
+
+                inputs = log.inputs(tick, inputs) if replaying else controls.poll()
+
+                if recorder is not None:
+                    recorder.record(tick, inputs)
+
+                renderer.snapshot(layers)
+                step(inputs)
+                tick        += 1
+                accumulator -= dt
+
+                if snapshots:
+                    history.push(tick, saveState())
+
+            render(accumulator / dt if interpolate else 1.0)
+            controls.presented()
+
+    finally:
+        if recorder is not None:
+            recorder.close(tick, gameState())
+
+    if replaying:
+        matches = log.check(gameState())
+        print("Replay {}: {} steps, final state {}".format(replay, tick, "matches" if matches else "differs"))
+        return matches
+
+
+# Authoritative server of the networked game (see `_network`): runs the headless simulation at `simRate` and seats every client
+# which joins as a new player (the first one takes over the player of the game). Each step applies the next input received from
+# every seat, and every `simRate // sendRate` steps the portable state snapshot is sent to the clients delta-compressed
+# against the state each of them acknowledged. Once per second the mean cost of a server tick (simulation and encoding)
+# and the bandwidth of each client are reported. The simulation waits for the first client, `frames` stops it after as many steps
+def serve(port=serverPort, frames=None, seed=None, host='127.0.0.1'):
+
+    global serving
+    serving = True
+
+    rng.seed(random.randrange(2**32) if seed is None else seed)
+
+    if preloadAssets:
+        sources.useArchive()
+        preload()
+
+    initialisation()
+
+    server   = GameServer(port, host)
+    dt       = 1 / simRate
+    interval = max(1, simRate // sendRate)
+    tick     = 0
+    cost     = 0
+    ticks    = 0
+    deadline = time.perf_counter()
+    reported = deadline
+
+    print("Serving on {}:{} ({} steps/s, state every {} steps)".format(host, port, simRate, interval))
+
+    while frames is None or tick < frames:
+
+        for address in server.poll():
+            seat = len(server.peers)
+
+            if seat >= len(players):
+                addPlayer(seat)
+
+            server.seat(address, seat, simRate)
+            print("Seat {} joined from {}:{}".format(seat, *address))
+
+        if not server.peers:
+            time.sleep(dt)
+            deadline = time.perf_counter()
+            continue
+
+        start = time.perf_counter()
+
+        step({peer.seat : server.inputs(peer) for peer in server.peers.values()})
+        tick += 1
+
+        if tick % interval == 0:
+            server.broadcast(tick, saveState(portable=True))
+
+        cost  += time.perf_counter() - start
+        ticks += 1
+
+        if start - reported >= 1:
+            print("Tick {:.3f} ms ({} steps) | {}".format(cost / ticks * 1000, tick, " | ".join(
+                  "seat {}: {:.0f} B/s out, {:.0f} B/s in".format(seat, rates["sent/s"], rates["received/s"]) for seat, rates in sorted(server.stats().items()))))
+
+            cost, ticks, reported = 0, 0, start
+
+        # Keep the fixed rate of the steps, a late server does not sleep until it caught up
+        deadline += dt
+        time.sleep(max(0, deadline - time.perf_counter()))
+
+    return tick
+
+
+# Inputs of all the seats for a step of the client: its own input and the keys the other seats held on the server
+def seatInputs(seat, inputs, remote):
+
+    seats       = {other : TickInput(held) for other, held in enumerate(remote)}
+    seats[seat] = inputs
+
+    return seats
+
+
+# Replace the game of the client with the `state` received from the server (see `GameClient.poll()`) and simulate again on top
+# of it the local inputs the server did not apply yet (`pending`, keyed by their step, the applied ones are dropped from it).
+# The server applies the inputs one per step as well, so the client ends up where the server will be after the same steps.
+# Returns the keys held on the other seats
+def reconcile(state, seat, pending):
+
+    global player, resimulating
+
+    latest, buffer, applied, remote = state
+
+    loadState(buffer)
+    player = players[seat]
+
+    while pending and next(iter(pending)) <= applied:
+        pending.popitem(last=False)
+
+    # The steps already happened once on the screen: their sounds (and the menu of a restart) must not repeat
+    resimulating   = True
+    channels.muted = True
+
+    for inputs in pending.values():
+        renderer.snapshot(layers)
+        step(seatInputs(seat, inputs, remote))
+
+    resimulating   = False
+    channels.muted = False
+
+    return remote
+
+
+# Client of the networked game: the local player is predicted by running the whole simulation locally with the local input,
+# which is sent to the server every step. Each state from the server replaces the local one and the local inputs the server
+# did not apply yet are simulated again on top of it (other seats keep holding the keys they held on the server), so the own
+# player reacts at once while the rest of the world follows the server. Rendering interpolates between the steps as usual
+def connect(host='127.0.0.1', port=serverPort, frames=None):
+
+    client = GameClient(host, port)
+
+    if preloadAssets:
+        sources.useArchive()
+        preload(progress=loadingScreen)
+
+    initialisation()
+
+    seat = client.join()
+
+    if seat is None:
+        print("No answer from the server at {}:{}".format(host, port))
+        return False
+
+    if client.simRate != simRate:
+        print("The server runs at {} steps/s, the client at {}".format(client.simRate, simRate))
+        return False
+
+    print("Joined {}:{} as seat {}".format(host, port, seat))
+
+    frame       = 0
+    tick        = 0
+    dt          = 1 / simRate
+    accumulator = 0
+
+    # Local inputs the server has not applied yet, keyed by their step, and the keys held on the other seats
+    pending     = OrderedDict()
+    remote      = list()
+
+    while frames is None or frame < frames:
+        frame += 1
+        profiler.frame()
+
+        for received in pygame.event.get():
+            if received.type == pygame.QUIT:
+                sys.exit()
+
+            if received.type == pygame.KEYDOWN and received.key in [pygame.K_F3, pygame.K_F4]:
+                if received.key == pygame.K_F3:
+                    profiler.toggle()
+
+                else:
+                    print("Profile saved to {}".format(profiler.dump()))
+                    print("Traffic: {}".format(client.traffic.rates()))
+
+                continue
+
+            controls.collect(received)
+
+        if isMenu:
+            menu.display()
+            clock.tick()
+            accumulator = 0
+
+        elapsed      = dt if headless else clock.tick(renderRate) / 1000
+        accumulator += min(elapsed, maxFrameTime)
+
+        # Newest state of the server followed by the local steps it did not see yet
+        state = client.poll()
+
+        if state is not None:
+            remote = reconcile(state, seat, pending)
+
+        while accumulator >= dt:
+
+            inputs = controls.poll()
+            tick  += 1
+
+            client.input(tick, inputs)
+            pending[tick] = inputs
 
-        # Update the screen and erase
-        pygame.display.update()
-        screen.blit(background, (0,0))
+            while len(pending) > snapshotFrames:
+                pending.popitem(last=False)
 
-        # Track how many frames were rendered in the current cycle
-        # and force to utilise only 60
-        clock.tick(60)
+            renderer.snapshot(layers)
+            step(seatInputs(seat, inputs, remote))
+            accumulator -= dt
 
+        render(accumulator / dt if interpolate else 1.0)
+        controls.presented()
 
+    print("Traffic: {}".format(client.traffic.rates()))
 
+    return True
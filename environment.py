@@ -0,0 +1,214 @@
+import os
+
+# The environment never opens a window nor plays any sound, the game has to be headless before it is imported
+os.environ.setdefault("DOGFIGHT2D_HEADLESS", "1")
+
+import dogfight2D as game
+
+import pygame
+import argparse, json, random, time
+
+# ***********************************************                     ***********************************************
+# *********************************************** @START ENVIRONMENT ***********************************************
+# ***********************************************                     ***********************************************
+
+# Actions of the environment: the keys held down during the step, i.e. the very same actions the player's keys drive
+# (see `airActions` and `groundActions` of the game). An action index selects one of them
+actions = [(), ("up",), ("down",), ("left",), ("right",), ("space",), ("up", "space")]
+
+# Number of the closest enemies described by the observation
+observedEnemies = 4
+
+# Weight of the health in the reward: the reward of a step is the score gained plus the health gained (negative when hit) times the weight
+healthWeight    = 0.01
+
+# Kinds of the enemies in the order of their codes within the observation (0 - no enemy)
+enemyKinds      = [game.Cactus, game.Bomb, game.Ufo]
+
+# Length of the observation vector (see `DogfightEnv.observe()`)
+observationSize = 8 + 4 * observedEnemies
+
+
+# Gym-style environment wrapping the simulation of the game: `reset(seed)` starts a new game and returns the first observation,
+# `step(action)` runs `repeat` fixed simulation steps holding the keys of the action and returns (observation, reward, done, info).
+# Nothing is rendered and there is no frame cap, so the environment runs as fast as the simulation itself (`render()` draws the
+# current frame onto the invisible screen when a frame is needed, e.g. for the pixel observations). The first reset initialises
+# the game, the following ones restart it in place; a game with the same seed always plays out the same way.
+# `limit` - steps after which the episode ends even if the player is alive (None - only the game over ends it)
+class DogfightEnv:
+
+    def __init__(self, repeat=1, limit=None):
+
+        self.repeat      = repeat
+        self.limit       = limit
+        self.initialised = False
+        self.held        = ()
+        self.steps       = 0
+        self.score       = 0
+        self.health      = 0
+
+    def reset(self, seed=None):
+
+        game.rng.seed(random.randrange(2**32) if seed is None else seed)
+
+        if not self.initialised:
+            if game.preloadAssets:
+                game.sources.useArchive()
+                game.preload()
+
+            game.initialisation()
+            pygame.mixer.music.stop()
+            self.initialised = True
+
+        else:
+            game.restart()
+
+        game.isMenu = False
+
+        self.held   = ()
+        self.steps  = 0
+        self.score, self.health = self.stats()
+
+        return self.observe()
+
+    def step(self, action):
+
+        held   = actions[action]
+        inputs = game.TickInput(held, [key for key in held if key not in self.held], [key for key in self.held if key not in held])
+
+        for i in range(self.repeat):
+            game.step(inputs)
+            self.steps += 1
+
+            if game.gameOver():
+                break
+
+            # The keys pressed by the action are only new in its first step
+            inputs = game.TickInput(held)
+
+        self.held = held
+
+        score, health = self.stats()
+        reward        = (score - self.score) + (health - self.health) * healthWeight
+        self.score, self.health = score, health
+
+        done = game.gameOver() or (self.limit is not None and self.steps >= self.limit)
+
+        return self.observe(), reward, done, {"score" : score, "health" : health, "steps" : self.steps}
+
+    # Score and health kept by the game's statistics
+    def stats(self):
+
+        states = {statistic['header'] : statistic['state'] for statistic in game.statistics.game_stats}
+        return states["Score"], states["Health"]
+
+    # Compact state vector of the game, all the values roughly within -1..1:
+        # player  - position, health, whether it is dead, hit, on the ground, and its shot cooldown
+        # UFO     - countdown of the chase
+        # enemies - for each of the `observedEnemies` closest enemies its kind (a code of `enemyKinds` divided by their number)
+        #           its position relative to the player and whether it was struck, zeros when there are fewer enemies
+    def observe(self):
+
+        player = game.player
+        width  = game.resolution['width']
+        height = game.resolution['height']
+
+        # The step left the spatial hash of the floor where the segments were before they scrolled
+        game.floor.refresh()
+
+        observation = [player.rect.centerx / width, player.rect.centery / height, player.life / game.Cowboy.life, float(player.dead),
+                       float(player.hit), float(bool(game.floor.collide(player))), min(game.simTime - player.previous_shot, 250) / 250,
+                       game.ufo.counter / game.Ufo.counter]
+
+        enemies = sorted((((enemy.rect.centerx - player.rect.centerx) / width, (enemy.rect.centery - player.rect.centery) / height, enemy)
+                          for enemy in game.dumb_enemies.sprites()), key=lambda entry: entry[0] ** 2 + entry[1] ** 2)
+
+        for dx, dy, enemy in enemies[:observedEnemies]:
+            observation += [(enemyKinds.index(enemy.__class__) + 1) / len(enemyKinds), dx, dy, float(enemy.striked)]
+
+        observation += [0.0] * (observationSize - len(observation))
+
+        return observation
+
+    # Frame of the current state: the sprites and the HUD are drawn and the screen is copied before the frame is presented
+    # (presenting a frame erases the screen of the full renderer for the next one)
+    def render(self):
+
+        game.renderer.draw(game.layers)
+        game.drawHud()
+
+        frame = game.screen.copy()
+        game.renderer.present()
+
+        return frame
+
+
+# ---------------------- THROUGHPUT BENCHMARK ----------------------
+
+# Step the environment with random actions (a new action every few steps, like a bot would) for the given number of steps
+# and return the simulation steps per second (`rate`), the episodes and the mean time of a reset in ms (`reset`)
+def throughput(steps, seed=0, repeat=1, limit=None):
+
+    env     = DogfightEnv(repeat=repeat, limit=limit)
+    policy  = random.Random(seed)
+    episode = 0
+    resets  = 0
+
+    start   = time.perf_counter()
+    env.reset(seed)
+    resets += time.perf_counter() - start
+
+    action  = 0
+    begin   = time.perf_counter()
+
+    for i in range(steps):
+        if i % 10 == 0:
+            action = policy.randrange(len(actions))
+
+        observation, reward, done, info = env.step(action)
+
+        if done:
+            episode += 1
+            start    = time.perf_counter()
+            env.reset(seed + episode)
+            resets  += time.perf_counter() - start
+
+    elapsed = time.perf_counter() - begin
+
+    return {"steps"     : steps,
+            "repeat"    : repeat,
+            "seconds"   : elapsed,
+            "rate"      : steps * repeat / elapsed,
+            "episodes"  : episode,
+            "reset"     : resets * 1000 / (episode + 1)}
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Dogfight2D environment throughput benchmark")
+    parser.add_argument("--steps",        type=int, default=20000,          help="environment steps to run")
+    parser.add_argument("--repeat",       type=int, default=1,              help="simulation steps per environment step")
+    parser.add_argument("--limit",        type=int,                         help="steps after which an episode ends")
+    parser.add_argument("--seed",         type=int, default=0,              help="seed of the first episode and of the random policy")
+    parser.add_argument("--entity-store", action="store_true",              help="keep the scrolling objects in the entity store")
+    parser.add_argument("--output",       default="environment.json",       help="JSON file the results are saved to")
+    arguments = parser.parse_args()
+
+    game.entityStore = arguments.entity_store
+
+    results = throughput(arguments.steps, arguments.seed, arguments.repeat, arguments.limit)
+    results.update({"entityStore" : game.entityStore,
+                    "pygame"      : pygame.version.ver,
+                    "time"        : time.strftime("%Y-%m-%dT%H:%M:%S")})
+
+    print("{steps} steps in {seconds:.2f} s: {rate:.0f} simulation steps/s, {episodes} episodes, {reset:.2f} ms per reset".format(**results))
+
+    with open(arguments.output, "w") as file:
+        json.dump(results, file, indent=4)
+
+    print("Results saved to {}".format(arguments.output))
+
+
+# Run the module only as a standalone program
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,38 @@
-from dogfight2D import * 
+from dogfight2D import *
+
+import argparse
+
+# Command line options of the main loop (`--headless` itself is read by the window settings on import)
+parser = argparse.ArgumentParser(description="Dogfight2D")
+parser.add_argument("--headless", action="store_true", help="run without any window or sound")
+parser.add_argument("--frames",   type=int,            help="stop after the given number of frames")
+parser.add_argument("--seed",     type=int,            help="seed of the game's random generator")
+parser.add_argument("--record",                        help="record the input log of the session to the given file")
+parser.add_argument("--replay",                        help="replay the given input log and check its final state")
+parser.add_argument("--pack",     action="store_true", help="pack the atlas sheets and the assets into the archive read at startup and exit")
+parser.add_argument("--serve",    action="store_true", help="run the headless server of the networked game")
+parser.add_argument("--connect",  metavar="HOST",      help="join the networked game served by the given host")
+parser.add_argument("--port",     type=int,            default=serverPort, help="UDP port of the networked game")
+parser.add_argument("--bind",                          default="127.0.0.1", help="address the server listens on (0.0.0.0 - all the interfaces, e.g. on a LAN)")
 
 # Run the module only as a standalone program
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    arguments = parser.parse_args()
+
+    if arguments.pack:
+        atlas.rebuild()
+        print('Packed {} assets into {}'.format(AssetArchive.pack(archivePath), archivePath))
+        sys.exit(0)
+
+    if arguments.serve:
+        serve(port=arguments.port, frames=arguments.frames, seed=arguments.seed, host=arguments.bind)
+        sys.exit(0)
+
+    if arguments.connect:
+        sys.exit(0 if connect(arguments.connect, arguments.port, frames=arguments.frames) else 1)
+
+    result    = main(frames=arguments.frames, seed=arguments.seed, record=arguments.record, replay=arguments.replay)
+
+    # Exit code of the replay tells whether it reproduced the recorded session
+    if arguments.replay:
+        sys.exit(0 if result else 1)